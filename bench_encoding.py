@@ -0,0 +1,56 @@
+"""Compare JSON (the app's encoder, as jsonify uses it) with MessagePack on synthetic Home pages
+
+    python bench_encoding.py [rows] [repeat]
+
+Reports encode and decode time, and raw and gzipped size, for both the rows and columns layouts.
+"""
+import gzip
+import json
+import random
+import sys
+import timeit
+from datetime import datetime, timedelta
+
+import msgpack
+
+from main import HOME_INSERT_COLUMNS, app, pack
+
+COLUMNS = ['home_id'] + list(HOME_INSERT_COLUMNS) + ['date_created']
+
+def synthetic_homes(count):
+    rng = random.Random(42)
+    start = datetime(2024, 1, 1)
+    homes = []
+    for home_id in range(1, count + 1):
+        homes.append((
+            home_id, 'owner-%d' % rng.randint(1, count // 4 + 1), 'Home %d' % home_id, rng.randint(0, 80),
+            rng.choice(['Residential', 'Rental', 'Vacation']), rng.choice([None, 'Roof replaced', 'New kitchen']),
+            rng.choice(['Bungalow', 'Two-storey', 'Apartment']), rng.randint(1, 4), rng.uniform(50, 1000),
+            rng.uniform(30, 500), rng.choice(['Concrete', 'Wood', 'Mixed']), rng.choice(['Concrete', 'Wood']),
+            rng.choice(['Tile', 'Vinyl', 'Wood']), rng.choice(['CHB', 'Plywood']), rng.choice(['Gypsum', 'Plywood']),
+            rng.uniform(5, 19), rng.uniform(117, 127), rng.random() < 0.2, start + timedelta(minutes=home_id),
+        ))
+    return homes
+
+def payloads(homes):
+    yield 'rows', [dict(zip(COLUMNS, home)) for home in homes]
+    yield 'columns', {"columns": COLUMNS, "rows": [list(home) for home in homes]}
+
+def bench(count, repeat):
+    homes = synthetic_homes(count)
+    print("%d rows, best of %d runs" % (count, repeat))
+    print("%-8s %-8s %10s %10s %10s %10s" % ('layout', 'format', 'encode ms', 'decode ms', 'bytes', 'gzip bytes'))
+    for layout, payload in payloads(homes):
+        encoders = [
+            ('json', lambda: app.json.dumps(payload).encode(), json.loads),
+            ('msgpack', lambda: pack(payload), lambda body: msgpack.unpackb(body, timestamp=3)),
+        ]
+        for name, encode, decode in encoders:
+            body = encode()
+            encode_ms = min(timeit.repeat(encode, number=1, repeat=repeat)) * 1000
+            decode_ms = min(timeit.repeat(lambda: decode(body), number=1, repeat=repeat)) * 1000
+            print("%-8s %-8s %10.2f %10.2f %10d %10d" % (
+                layout, name, encode_ms, decode_ms, len(body), len(gzip.compress(body, 6))))
+
+if __name__ == '__main__':
+    bench(int(sys.argv[1]) if len(sys.argv) > 1 else 1000, int(sys.argv[2]) if len(sys.argv) > 2 else 5)
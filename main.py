@@ -1,6 +1,49 @@
+import base64
+import binascii
+import contextlib
+import functools
+import gzip
+import hashlib
+import json
+import math
+import mmap
 import os
-from flask import Flask, jsonify, request
+import re
+import socket
+import struct
+import tempfile
+import threading
+import time
+import uuid
+import zlib
+from array import array
+from collections import OrderedDict, deque
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date, datetime, timezone
+from decimal import Decimal
+from urllib.parse import urlencode
+from bisect import bisect_left
+from flask import Flask, Response, jsonify, make_response, request, g, has_request_context, stream_with_context
+import click
+import msgpack
 import mysql.connector
+import numpy as np
+from mysql.connector import errorcode
+
+try:
+    import fcntl
+except ImportError:  # Windows development machines: no cross-process locking
+    fcntl = None
+
+try:
+    import brotli
+except ImportError:  # Optional: offered to clients only when installed
+    brotli = None
+
+try:
+    import zstandard
+except ImportError:  # Optional: offered to clients only when installed
+    zstandard = None
 
 app = Flask(__name__)
 
@@ -16,29 +59,1348 @@ db_config = {
 # API Key (store this in your environment variables)
 API_KEY = os.getenv('API_KEY')
 
+# Connection pool settings (per worker process: every gunicorn worker gets its own pool)
+DB_POOL_SIZE = int(os.getenv('DB_POOL_SIZE', os.getenv('GUNICORN_THREADS', 5)))  # One per thread (see nixpacks.toml)
+DB_POOL_TIMEOUT = float(os.getenv('DB_POOL_TIMEOUT', 5))  # Seconds to wait for a free connection before a 503
+DB_POOL_MAX_LIFETIME = float(os.getenv('DB_POOL_MAX_LIFETIME', 1800))  # Recycle connections older than this
+DB_POOL_PING_AFTER = float(os.getenv('DB_POOL_PING_AFTER', 10))  # Ping connections idle longer than this on checkout
+
+class PoolExhaustedError(Exception):
+    """Raised when no pooled connection becomes free within DB_POOL_TIMEOUT"""
+
+class ConnectionPool:
+    """Bounded pool of MySQL connections owned by a single process"""
+
+    def __init__(self, size, timeout, max_lifetime, ping_after):
+        self.pid = os.getpid()
+        self.size = size
+        self.timeout = timeout
+        self.max_lifetime = max_lifetime
+        self.ping_after = ping_after
+        self._cond = threading.Condition()
+        self._idle = deque()  # (connection, released_at), most recently released last
+        self._created_at = {}  # id(connection) -> monotonic creation time
+        self._in_use = 0
+        self._checkouts = 0
+        self._waits = 0
+        self._wait_time = 0.0
+        self._max_wait = 0.0
+        self._timeouts = 0
+        self._connections_created = 0
+        self._recycled = 0
+        self._health_check_failures = 0
+
+    def _connect(self):
+        connection = mysql.connector.connect(**db_config)
+        with self._cond:
+            self._created_at[id(connection)] = time.monotonic()
+            self._connections_created += 1
+        return connection
+
+    def _discard(self, connection):
+        with self._cond:
+            self._created_at.pop(id(connection), None)
+        try:
+            connection.close()
+        except Exception:
+            pass
+
+    def _expired(self, connection, now):
+        return now - self._created_at.get(id(connection), now) > self.max_lifetime
+
+    def acquire(self):
+        """Check out a healthy connection, waiting at most self.timeout seconds for one to free up"""
+        start = time.monotonic()
+        deadline = start + self.timeout
+        connection = None
+        released_at = None
+        with self._cond:
+            while True:
+                if self._idle:
+                    # LIFO keeps a small set of connections warm instead of cycling through all of them
+                    connection, released_at = self._idle.pop()
+                    break
+                if self._in_use < self.size:
+                    break
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    self._timeouts += 1
+                    raise PoolExhaustedError(
+                        "No database connection available within %.1f seconds (pool size %d)" % (self.timeout, self.size)
+                    )
+                self._cond.wait(remaining)
+            self._in_use += 1
+            waited = time.monotonic() - start
+            self._checkouts += 1
+            if waited > 0.001:
+                self._waits += 1
+            self._wait_time += waited
+            self._max_wait = max(self._max_wait, waited)
+
+        try:
+            now = time.monotonic()
+            if connection is not None and self._expired(connection, now):
+                self._discard(connection)
+                with self._cond:
+                    self._recycled += 1
+                connection = None
+            elif connection is not None and now - released_at > self.ping_after and not connection.is_connected():
+                self._discard(connection)
+                with self._cond:
+                    self._health_check_failures += 1
+                connection = None
+            if connection is None:
+                connection = self._connect()
+            return connection
+        except Exception:
+            with self._cond:
+                self._in_use -= 1
+                self._cond.notify()
+            raise
+
+    def release(self, connection):
+        """Return a connection to the pool, ending any open transaction first"""
+        if os.getpid() != self.pid:
+            return
+        healthy = True
+        try:
+            if connection.in_transaction:
+                connection.rollback()
+        except Exception:
+            healthy = False
+        if healthy and self._expired(connection, time.monotonic()):
+            healthy = False
+            with self._cond:
+                self._recycled += 1
+        if not healthy:
+            self._discard(connection)
+        with self._cond:
+            self._in_use -= 1
+            if healthy:
+                self._idle.append((connection, time.monotonic()))
+            self._cond.notify()
+
+    def stats(self):
+        with self._cond:
+            return {
+                "pid": self.pid,
+                "size": self.size,
+                "in_use": self._in_use,
+                "idle": len(self._idle),
+                "checkouts": self._checkouts,
+                "waits": self._waits,
+                "wait_time_total": round(self._wait_time, 6),
+                "wait_time_avg": round(self._wait_time / self._checkouts, 6) if self._checkouts else 0.0,
+                "wait_time_max": round(self._max_wait, 6),
+                "timeouts": self._timeouts,
+                "connections_created": self._connections_created,
+                "recycled": self._recycled,
+                "health_check_failures": self._health_check_failures
+            }
+
+_pool = None
+_pool_lock = threading.Lock()
+
+def _reset_pool_after_fork():
+    # Sockets inherited from the parent belong to the parent; drop them without closing
+    global _pool, _pool_lock
+    _pool = None
+    _pool_lock = threading.Lock()
+
+os.register_at_fork(after_in_child=_reset_pool_after_fork)
+
+def get_pool():
+    """Return this process's connection pool, creating it lazily (and again after a fork)"""
+    global _pool
+    pool = _pool
+    if pool is None or pool.pid != os.getpid():
+        with _pool_lock:
+            if _pool is None or _pool.pid != os.getpid():
+                _pool = ConnectionPool(DB_POOL_SIZE, DB_POOL_TIMEOUT, DB_POOL_MAX_LIFETIME, DB_POOL_PING_AFTER)
+            pool = _pool
+    return pool
+
 def get_db_connection():
-    return mysql.connector.connect(**db_config)
+    """Return the connection bound to the current request, checking one out of the pool on first use"""
+    connection = g.get('db_connection')
+    if connection is None:
+        stats = request_stats()
+        start = time.perf_counter()
+        connection = InstrumentedConnection(get_pool().acquire(), stats)
+        stats.connect += time.perf_counter() - start
+        g.db_connection = connection
+    return connection
 
-def initialize_database():
-    """Drop existing tables and recreate Homeowner and Home tables"""
+@app.teardown_appcontext
+def release_db_connection(exception):
+    connection = g.pop('db_connection', None)
+    if connection is not None:
+        connection.finish()
+        get_pool().release(connection.connection)
+
+@app.errorhandler(PoolExhaustedError)
+def handle_pool_exhausted(e):
+    return jsonify({"error": str(e)}), 503, {"Retry-After": "1"}
+
+class InvalidRequestError(Exception):
+    """Raised for malformed query parameters; answered with a 400"""
+
+@app.errorhandler(InvalidRequestError)
+def handle_invalid_request(e):
+    return jsonify({"error": str(e)}), 400
+
+# Request metrics: every request's timings are folded into per-route histograms in this worker, and each
+# worker writes a snapshot to METRICS_DIR every METRICS_FLUSH_SECONDS so /metrics can report them all
+METRICS_DIR = os.getenv('METRICS_DIR', os.path.join(tempfile.gettempdir(), 'inspectify-metrics'))
+METRICS_FLUSH_SECONDS = float(os.getenv('METRICS_FLUSH_SECONDS', 5))
+SECONDS_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+ROWS_BUCKETS = (0, 1, 10, 100, 1000, 10000, 100000)
+BYTES_BUCKETS = (256, 1024, 4096, 16384, 65536, 262144, 1048576, 4194304, 16777216)
+REQUEST_STATS_KEY = 'inspectify.request_stats'
+
+class RequestStats:
+    """Time and volume one request spent in each stage, filled in as it runs
+
+    deadline (monotonic) and check (a callable returning a reason to give up, or None) let the
+    QueryWatchdog kill the request's statements; cancelled holds the reason once it has.
+    """
+    __slots__ = ('route', 'connect', 'query', 'rows', 'serialize', 'bytes', 'deadline', 'check', 'cancelled')
+
+    def __init__(self):
+        self.route = 'unmatched'
+        self.connect = 0.0
+        self.query = 0.0
+        self.rows = 0
+        self.serialize = 0.0
+        self.bytes = 0
+        self.deadline = None
+        self.check = None
+        self.cancelled = None
+
+def request_stats():
+    """The current request's RequestStats, or a throwaway one outside a request"""
+    if has_request_context():
+        stats = request.environ.get(REQUEST_STATS_KEY)
+        if stats is not None:
+            return stats
+    return RequestStats()
+
+# Statement log: each statement's execute plus fetch time is aggregated by fingerprint, and statements
+# slower than SLOW_QUERY_SECONDS are printed with their parameters and route
+SLOW_QUERY_SECONDS = float(os.getenv('SLOW_QUERY_SECONDS', 0.5))
+QUERY_STATS_MAX_FINGERPRINTS = int(os.getenv('QUERY_STATS_MAX_FINGERPRINTS', 1000))  # Later ones are pooled under "other"
+SLOW_QUERY_LOG_MAX_CHARS = 2000
+
+FINGERPRINT_RULES = [
+    (re.compile(r"'(?:[^'\\]|\\.|'')*'|\"(?:[^\"\\]|\\.|\"\")*\""), '?'),  # String literals
+    (re.compile(r"/\*.*?\*/|--[^\n]*|#[^\n]*", re.S), ' '),  # Comments
+    (re.compile(r"\b0x[0-9a-f]+\b|(?<![\w.])[-+]?\d+(?:\.\d+)?(?:e[-+]?\d+)?\b", re.I), '?'),  # Numbers
+    (re.compile(r"%s|%\(\w+\)s"), '?'),  # Driver placeholders
+    (re.compile(r"\s+"), ' '),
+    (re.compile(r"\(\s*\?(?:\s*,\s*\?)*\s*\)"), '(?+)'),  # IN lists and VALUES rows of any length
+    (re.compile(r"\(\?\+\)(?:\s*,\s*\(\?\+\))+"), '(?+)'),  # Multi-row VALUES
+]
+
+@functools.lru_cache(maxsize=4096)
+def fingerprint(sql):
+    """Normalize a statement so executions differing only in literals, placeholders or list lengths match"""
+    for pattern, replacement in FINGERPRINT_RULES:
+        sql = pattern.sub(replacement, sql)
+    return sql.strip()
+
+def truncate(text, limit=SLOW_QUERY_LOG_MAX_CHARS):
+    return text if len(text) <= limit else text[:limit] + '...'
+
+class InstrumentedCursor:
+    """Cursor wrapper adding execute and fetch time, and rows fetched, to a RequestStats and the statement log
+
+    A statement's time and rows run from its execute until the next execute or close.
+    """
+
+    def __init__(self, cursor, stats, connection_id=None):
+        self.cursor = cursor
+        self.stats = stats
+        self.connection_id = connection_id
+        self._statement = None  # [sql, params, seconds, rows] of the statement being read
+        self._watch = None  # QueryWatchdog key while the statement runs or has rows left to read
+
+    def __getattr__(self, name):
+        return getattr(self.cursor, name)
+
+    def _cancelled(self, error):
+        """Turn the error MySQL raises for a statement the watchdog killed into a QueryCancelledError"""
+        if self.stats.cancelled is not None:
+            raise QueryCancelledError(self.stats.cancelled) from error
+        raise error
+
+    def cancel(self, reason):
+        """KILL QUERY this cursor's statement now, if it is still running or sending rows"""
+        if self._watch is not None:
+            get_watchdog().kill(self._watch, reason)
+
+    def _finish(self):
+        if self._watch is not None:
+            get_watchdog().untrack(self._watch)
+            self._watch = None
+        statement, self._statement = self._statement, None
+        if statement is not None:
+            sql, params, seconds, rows = statement
+            get_metrics().observe_query(fingerprint(sql), seconds, rows)
+            if seconds >= SLOW_QUERY_SECONDS:
+                print("Slow query (%.3fs, %d rows, route %s): %s params=%s" % (
+                    seconds, rows, self.stats.route, truncate(' '.join(sql.split())), truncate(repr(params))))
+
+    def _timed(self, seconds, rows):
+        self.stats.query += seconds
+        self.stats.rows += rows
+        if self._statement is not None:
+            self._statement[2] += seconds
+            self._statement[3] += rows
+
+    def execute(self, operation, params=None, *args, **kwargs):
+        self._finish()
+        self._statement = [operation, params, 0.0, 0]
+        if self.connection_id is not None and (self.stats.deadline is not None or self.stats.check is not None):
+            self._watch = get_watchdog().track(self.connection_id, self.stats)
+        start = time.perf_counter()
+        try:
+            return self.cursor.execute(operation, params, *args, **kwargs)
+        except mysql.connector.Error as e:
+            self._cancelled(e)
+        finally:
+            self._timed(time.perf_counter() - start, 0)
+
+    def fetchone(self):
+        start = time.perf_counter()
+        try:
+            row = self.cursor.fetchone()
+        except mysql.connector.Error as e:
+            self._cancelled(e)
+        self._timed(time.perf_counter() - start, row is not None)
+        return row
+
+    def fetchmany(self, size=1):
+        start = time.perf_counter()
+        try:
+            rows = self.cursor.fetchmany(size)
+        except mysql.connector.Error as e:
+            self._cancelled(e)
+        self._timed(time.perf_counter() - start, len(rows))
+        return rows
+
+    def fetchall(self):
+        start = time.perf_counter()
+        try:
+            rows = self.cursor.fetchall()
+        except mysql.connector.Error as e:
+            self._cancelled(e)
+        self._timed(time.perf_counter() - start, len(rows))
+        return rows
+
+    def close(self):
+        self._finish()
+        return self.cursor.close()
+
+class InstrumentedConnection:
+    """Pooled connection wrapper whose cursors report to the request's RequestStats"""
+
+    def __init__(self, connection, stats):
+        self.connection = connection
+        self.stats = stats
+        self._cursors = []
+
+    def __getattr__(self, name):
+        return getattr(self.connection, name)
+
+    def cursor(self, *args, **kwargs):
+        cursor = InstrumentedCursor(self.connection.cursor(*args, **kwargs), self.stats, self.connection.connection_id)
+        self._cursors.append(cursor)
+        return cursor
+
+    def finish(self):
+        """Log the last statement of cursors the route never closed"""
+        for cursor in self._cursors:
+            cursor._finish()
+        self._cursors = []
+
+# Query cancellation: statements of a request past REQUEST_DEADLINE_SECONDS, or whose client hung up, get a
+# KILL QUERY from a side connection so neither the worker thread nor the MySQL thread keeps working for nobody.
+# Streamed exports (once their 200 is sent) and migrations have no deadline; exports keep the disconnect check.
+REQUEST_DEADLINE_SECONDS = float(os.getenv('REQUEST_DEADLINE_SECONDS', 25))  # 0 disables
+QUERY_WATCHDOG_INTERVAL = float(os.getenv('QUERY_WATCHDOG_INTERVAL', 0.5))
+
+class QueryCancelledError(Exception):
+    """Raised in place of MySQL's interruption error for a statement the watchdog killed; args[0] is the reason"""
+
+@app.errorhandler(QueryCancelledError)
+def handle_query_cancelled(e):
+    if e.args[0] == 'deadline':
+        return jsonify({"error": "Request exceeded its %g second deadline; the query was cancelled." % REQUEST_DEADLINE_SECONDS}), 504
+    # The client is gone; nobody reads this, but the request ends now instead of finishing the work
+    return jsonify({"error": "Client closed the request; the query was cancelled."}), 499
+
+def client_disconnected(sock):
+    """Check callable for RequestStats: 'disconnect' once the peer has closed the request's socket"""
+    def check():
+        try:
+            return 'disconnect' if sock.recv(1, socket.MSG_PEEK | socket.MSG_DONTWAIT) == b'' else None
+        except (BlockingIOError, InterruptedError):
+            return None
+        except OSError:
+            return 'disconnect'
+    return check
+
+def kill_query(connection_id):
+    """KILL QUERY on another connection's thread; a fresh side connection, since the pool may be exhausted"""
+    side = mysql.connector.connect(connection_timeout=5, **db_config)
     try:
-        connection = get_db_connection()
-        cursor = connection.cursor()
+        cursor = side.cursor()
+        cursor.execute("KILL QUERY %d" % int(connection_id))
+        cursor.close()
+    finally:
+        side.close()
 
-        # Drop tables if they exist
-        cursor.execute("DROP TABLE IF EXISTS Home;")
-        cursor.execute("DROP TABLE IF EXISTS Homeowner;")
+class QueryWatchdog:
+    """Background thread killing tracked statements whose RequestStats passed its deadline or whose check fires"""
 
-        # Recreate Homeowner table
-        cursor.execute("""
-            CREATE TABLE Homeowner (
+    def __init__(self, interval):
+        self.pid = os.getpid()
+        self.interval = interval
+        self._lock = threading.Lock()
+        self._statements = {}  # key -> [connection_id, RequestStats, Event set once a KILL in flight is done, or None]
+        self._next_key = 0
+        self._thread = None
+
+    def track(self, connection_id, stats):
+        with self._lock:
+            self._next_key += 1
+            self._statements[self._next_key] = [connection_id, stats, None]
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name='query-watchdog', daemon=True)
+                self._thread.start()
+            return self._next_key
+
+    def untrack(self, key):
+        while True:
+            with self._lock:
+                entry = self._statements.get(key)
+                if entry is None:
+                    return
+                killing = entry[2]
+                if killing is None:
+                    del self._statements[key]
+                    return
+            # A KILL aimed at this statement is on its way: wait for it, so the connection can never go back to
+            # the pool, and on to another request, before it lands. Only this statement waits, not the lock.
+            killing.wait()
+
+    def kill(self, key, reason):
+        with self._lock:
+            entry = self._statements.get(key)
+            if entry is None or entry[2] is not None:
+                return False
+            connection_id, stats, _ = entry
+            entry[2] = threading.Event()
+            stats.cancelled = reason
+        killing = entry[2]
+        try:
+            kill_query(connection_id)
+        except Exception as e:
+            print("Error cancelling query on connection %s:" % connection_id, e)
+            with self._lock:
+                entry[2] = None  # Still tracked: the next poll tries again
+            stats.cancelled = None
+            return False
+        else:
+            with self._lock:
+                self._statements.pop(key, None)
+        finally:
+            killing.set()
+        print("Cancelled query on connection %s (%s, route %s)" % (connection_id, reason, stats.route))
+        get_metrics().observe_cancel(stats.route, reason)
+        return True
+
+    def _run(self):
+        while True:
+            time.sleep(self.interval)
+            now = time.monotonic()
+            with self._lock:
+                statements = [(key, entry[1]) for key, entry in self._statements.items() if entry[2] is None]
+            for key, stats in statements:
+                # One failing check (say, a socket that cannot be peeked at) must not end the thread for good
+                try:
+                    reason = 'deadline' if stats.deadline is not None and now > stats.deadline else None
+                    if reason is None and stats.check is not None:
+                        reason = stats.check()
+                    if reason is not None:
+                        self.kill(key, reason)
+                except Exception as e:
+                    print("Error in query watchdog:", e)
+
+_watchdog = None
+_watchdog_lock = threading.Lock()
+
+def get_watchdog():
+    """Return this process's QueryWatchdog (recreated after a fork, whose child has no watchdog thread)"""
+    global _watchdog
+    with _watchdog_lock:
+        if _watchdog is None or _watchdog.pid != os.getpid():
+            _watchdog = QueryWatchdog(QUERY_WATCHDOG_INTERVAL)
+        return _watchdog
+
+class Metrics:
+    """Prometheus histograms and counters for this worker, merged with the other workers' snapshots on scrape"""
+
+    HISTOGRAMS = (
+        # (name, help, buckets, RequestStats attribute or None for total latency)
+        ('http_request_duration_seconds', "Time from receiving a request to sending the last body byte", SECONDS_BUCKETS, None),
+        ('db_connect_seconds', "Time spent checking out (and opening) a database connection", SECONDS_BUCKETS, 'connect'),
+        ('db_query_seconds', "Time spent in cursor execute and fetch calls", SECONDS_BUCKETS, 'query'),
+        ('db_rows', "Rows fetched from MySQL per request", ROWS_BUCKETS, 'rows'),
+        ('serialize_seconds', "Time spent encoding response bodies", SECONDS_BUCKETS, 'serialize'),
+        ('response_bytes', "Response body bytes sent, after compression", BYTES_BUCKETS, 'bytes'),
+    )
+
+    def __init__(self, directory, flush_interval):
+        self.directory = directory
+        self.flush_interval = flush_interval
+        self.pid = os.getpid()
+        self._lock = threading.Lock()
+        self._histograms = {}  # (name, route, method) -> [bucket counts..., +Inf count, sum]
+        self._requests = {}  # (route, method, status) -> count
+        self._queries = {}  # fingerprint -> [count, seconds, rows, max seconds, bucket counts..., +Inf count]
+        self._cancels = {}  # (route, reason) -> count
+        self._flushed_at = time.monotonic()
+
+    def observe(self, stats, method, status, duration):
+        with self._lock:
+            for name, _, buckets, attribute in self.HISTOGRAMS:
+                value = duration if attribute is None else getattr(stats, attribute)
+                series = self._histograms.get((name, stats.route, method))
+                if series is None:
+                    series = self._histograms[(name, stats.route, method)] = [0] * (len(buckets) + 1) + [0.0]
+                series[bisect_left(buckets, value)] += 1
+                series[-1] += value
+            key = (stats.route, method, status)
+            self._requests[key] = self._requests.get(key, 0) + 1
+            due = time.monotonic() - self._flushed_at >= self.flush_interval
+        if due:
+            self.flush()
+
+    def observe_query(self, fingerprint, seconds, rows):
+        with self._lock:
+            series = self._queries.get(fingerprint)
+            if series is None:
+                if len(self._queries) >= QUERY_STATS_MAX_FINGERPRINTS:
+                    fingerprint = 'other'
+                    series = self._queries.get(fingerprint)
+                if series is None:
+                    series = self._queries[fingerprint] = [0, 0.0, 0, 0.0] + [0] * (len(SECONDS_BUCKETS) + 1)
+            series[0] += 1
+            series[1] += seconds
+            series[2] += rows
+            series[3] = max(series[3], seconds)
+            series[4 + bisect_left(SECONDS_BUCKETS, seconds)] += 1
+
+    def observe_cancel(self, route, reason):
+        with self._lock:
+            self._cancels[(route, reason)] = self._cancels.get((route, reason), 0) + 1
+
+    def snapshot(self):
+        with self._lock:
+            return {
+                "cancels": [list(key) + [count] for key, count in self._cancels.items()],
+                "histograms": [list(key) + [list(series)] for key, series in self._histograms.items()],
+                "requests": [list(key) + [count] for key, count in self._requests.items()],
+                "queries": [[key, list(series)] for key, series in self._queries.items()]
+            }
+
+    def flush(self):
+        """Write this worker's snapshot where the other workers' /metrics can read it (atomic rename)"""
+        with self._lock:
+            self._flushed_at = time.monotonic()
+        try:
+            os.makedirs(self.directory, exist_ok=True)
+            path = os.path.join(self.directory, '%d.json' % os.getpid())
+            with open(path + '.tmp', 'w') as f:
+                json.dump(self.snapshot(), f)
+            os.replace(path + '.tmp', path)
+        except OSError as e:
+            print("Error writing metrics snapshot:", e)
+
+    def collect(self):
+        """This worker's live series plus the last snapshot of every other worker, summed"""
+        snapshots = [self.snapshot()]
+        own = '%d.json' % os.getpid()
+        try:
+            names = [name for name in os.listdir(self.directory) if name.endswith('.json') and name != own]
+        except OSError:
+            names = []
+        for name in names:
+            try:
+                with open(os.path.join(self.directory, name)) as f:
+                    snapshots.append(json.load(f))
+            except (OSError, ValueError):
+                continue
+        histograms, requests, queries, cancels = {}, {}, {}, {}
+        for snapshot in snapshots:
+            for route, reason, count in snapshot.get('cancels', []):
+                cancels[(route, reason)] = cancels.get((route, reason), 0) + count
+            for key, series in snapshot.get('queries', []):
+                merged = queries.get(key)
+                queries[key] = series if merged is None else (
+                    [merged[0] + series[0], merged[1] + series[1], merged[2] + series[2], max(merged[3], series[3])]
+                    + [a + b for a, b in zip(merged[4:], series[4:])]
+                )
+            for name, route, method, series in snapshot['histograms']:
+                merged = histograms.get((name, route, method))
+                histograms[(name, route, method)] = series if merged is None else [a + b for a, b in zip(merged, series)]
+            for route, method, status, count in snapshot['requests']:
+                requests[(route, method, status)] = requests.get((route, method, status), 0) + count
+        return histograms, requests, queries, cancels
+
+    def top_queries(self, limit, order):
+        """Fingerprints across all workers, largest first by order (total, avg, p95, max or count)"""
+        _, _, queries, _ = self.collect()
+        entries = []
+        for key, series in queries.items():
+            count, seconds, rows, longest = series[:4]
+            entries.append({
+                "fingerprint": key,
+                "id": hashlib.blake2b(key.encode(), digest_size=8).hexdigest(),
+                "count": count,
+                "total": round(seconds, 6),
+                "avg": round(seconds / count, 6),
+                "p95": round(min(bucket_quantile(0.95, SECONDS_BUCKETS, series[4:]), longest), 6),
+                "max": round(longest, 6),
+                "rows": rows,
+                "rows_avg": round(rows / count, 2)
+            })
+        entries.sort(key=lambda entry: entry[order], reverse=True)
+        return entries[:limit]
+
+    def render(self):
+        """Prometheus text exposition format (version 0.0.4)"""
+        histograms, requests, _, cancels = self.collect()
+        lines = [
+            '# HELP http_requests_total Requests served, by route, method and status',
+            '# TYPE http_requests_total counter'
+        ]
+        for (route, method, status), count in sorted(requests.items()):
+            lines.append('http_requests_total{route="%s",method="%s",status="%s"} %d' % (
+                metric_label(route), method, status, count))
+        lines.append('# HELP db_queries_cancelled_total Statements killed by the query watchdog, by route and reason')
+        lines.append('# TYPE db_queries_cancelled_total counter')
+        for (route, reason), count in sorted(cancels.items()):
+            lines.append('db_queries_cancelled_total{route="%s",reason="%s"} %d' % (metric_label(route), reason, count))
+        for name, help_text, buckets, _ in self.HISTOGRAMS:
+            lines.append('# HELP %s %s' % (name, help_text))
+            lines.append('# TYPE %s histogram' % name)
+            for (series_name, route, method), series in sorted(histograms.items()):
+                if series_name != name:
+                    continue
+                labels = 'route="%s",method="%s"' % (metric_label(route), method)
+                cumulative = 0
+                for bound, count in zip(buckets, series):
+                    cumulative += count
+                    lines.append('%s_bucket{%s,le="%s"} %d' % (name, labels, bound, cumulative))
+                total = cumulative + series[len(buckets)]
+                lines.append('%s_bucket{%s,le="+Inf"} %d' % (name, labels, total))
+                lines.append('%s_sum{%s} %r' % (name, labels, float(series[-1])))
+                lines.append('%s_count{%s} %d' % (name, labels, total))
+        return '\n'.join(lines) + '\n'
+
+def bucket_quantile(q, buckets, counts):
+    """Estimate a quantile from histogram bucket counts by linear interpolation, as histogram_quantile does"""
+    total = sum(counts)
+    rank = q * total
+    cumulative = 0
+    for i, count in enumerate(counts):
+        if count and cumulative + count >= rank:
+            lower = buckets[i - 1] if i > 0 else 0.0
+            if i == len(buckets):
+                return lower
+            return lower + (buckets[i] - lower) * (rank - cumulative) / count
+        cumulative += count
+    return 0.0
+
+def metric_label(value):
+    return value.replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+_metrics = None
+
+def get_metrics():
+    """Return this process's Metrics (recreated after a fork, like the pool)"""
+    global _metrics
+    if _metrics is None or _metrics.pid != os.getpid():
+        _metrics = Metrics(METRICS_DIR, METRICS_FLUSH_SECONDS)
+    return _metrics
+
+class MetricsMiddleware:
+    """WSGI middleware timing each request until its last body byte is sent, streamed bodies included"""
+
+    def __init__(self, wsgi_app):
+        self.wsgi_app = wsgi_app
+
+    def __call__(self, environ, start_response):
+        start = time.perf_counter()
+        stats = environ[REQUEST_STATS_KEY] = RequestStats()
+        if REQUEST_DEADLINE_SECONDS > 0:
+            stats.deadline = time.monotonic() + REQUEST_DEADLINE_SECONDS
+        client = environ.get('gunicorn.socket') or environ.get('werkzeug.socket')
+        if client is not None:
+            stats.check = client_disconnected(client)
+        status = []
+
+        def capture_start_response(status_line, headers, exc_info=None):
+            status[:] = [status_line.split(' ', 1)[0]]
+            return start_response(status_line, headers, exc_info)
+
+        try:
+            body = self.wsgi_app(environ, capture_start_response)
+        except Exception:
+            get_metrics().observe(stats, environ.get('REQUEST_METHOD', ''), '500', time.perf_counter() - start)
+            raise
+        return self._iterate(body, stats, environ.get('REQUEST_METHOD', ''), status, start)
+
+    def _iterate(self, body, stats, method, status, start):
+        try:
+            for chunk in body:
+                stats.bytes += len(chunk)
+                yield chunk
+        finally:
+            if hasattr(body, 'close'):
+                body.close()
+            get_metrics().observe(stats, method, status[0] if status else '500', time.perf_counter() - start)
+
+app.wsgi_app = MetricsMiddleware(app.wsgi_app)
+
+@app.before_request
+def label_request_metrics():
+    if request.url_rule is not None:
+        request_stats().route = request.url_rule.rule
+
+# Response encoding: JSON by default, MessagePack when the client's Accept prefers it
+MSGPACK_MIMETYPES = ('application/msgpack', 'application/x-msgpack')
+
+def msgpack_default(obj):
+    """Encode the MySQL types MessagePack lacks; naive DATETIMEs are UTC, as the JSON encoder assumes"""
+    if isinstance(obj, datetime):
+        return msgpack.Timestamp.from_datetime(obj if obj.tzinfo else obj.replace(tzinfo=timezone.utc))
+    if isinstance(obj, date):
+        return obj.isoformat()
+    if isinstance(obj, Decimal):
+        return float(obj)
+    if isinstance(obj, (set, bytearray)):
+        return list(obj) if isinstance(obj, set) else bytes(obj)
+    raise TypeError("Cannot encode %r as MessagePack" % type(obj))
+
+def pack(payload):
+    return msgpack.packb(payload, default=msgpack_default)
+
+def response_format():
+    """Return 'msgpack' when the Accept header prefers MessagePack over JSON, otherwise 'json'"""
+    best = request.accept_mimetypes.best_match(('application/json',) + MSGPACK_MIMETYPES)
+    return 'msgpack' if best in MSGPACK_MIMETYPES else 'json'
+
+def render(payload, status=200):
+    """Encode a read route's payload in the negotiated format (jsonify unless the client asked for MessagePack)"""
+    start = time.perf_counter()
+    if response_format() == 'msgpack':
+        response = Response(pack(payload), status=status, mimetype='application/msgpack')
+    else:
+        response = jsonify(payload)
+        response.status_code = status
+    request_stats().serialize += time.perf_counter() - start
+    response.vary.add('Accept')
+    return response
+
+def get_request_payload():
+    """Decode a JSON or (Content-Type: application/msgpack) MessagePack request body"""
+    if request.mimetype in MSGPACK_MIMETYPES:
+        try:
+            return msgpack.unpackb(request.get_data(), timestamp=3)
+        except (ValueError, msgpack.UnpackException):
+            raise InvalidRequestError("Request body is not valid MessagePack.")
+    return request.json
+
+# Pagination settings: list routes never return more than PAGE_SIZE_MAX rows per request
+PAGE_SIZE_DEFAULT = int(os.getenv('PAGE_SIZE_DEFAULT', 100))
+PAGE_SIZE_MAX = int(os.getenv('PAGE_SIZE_MAX', 1000))
+
+def encode_cursor(scope, key):
+    """Build the opaque next-page token for the last primary key of a page"""
+    payload = json.dumps({"s": scope, "k": key}, separators=(',', ':')).encode()
+    return base64.urlsafe_b64encode(payload).decode().rstrip('=')
+
+def decode_cursor(scope, token, key_type):
+    try:
+        payload = json.loads(base64.urlsafe_b64decode(token + '=' * (-len(token) % 4)))
+        key = payload['k']
+        if payload['s'] != scope or not isinstance(key, key_type) or isinstance(key, bool):
+            raise ValueError(token)
+        return key
+    except (ValueError, KeyError, TypeError, binascii.Error):
+        raise InvalidRequestError("Invalid cursor.")
+
+def get_limit_arg():
+    """Read ?limit=, capped at PAGE_SIZE_MAX"""
+    try:
+        limit = int(request.args.get('limit', PAGE_SIZE_DEFAULT))
+    except ValueError:
+        raise InvalidRequestError("limit must be an integer.")
+    if limit < 1:
+        raise InvalidRequestError("limit must be positive.")
+    return min(limit, PAGE_SIZE_MAX)
+
+def get_page_args(scope, key_type):
+    """Read ?limit= and ?cursor=, returning (limit, last key of the previous page or None)"""
+    token = request.args.get('cursor')
+    after = decode_cursor(scope, token, key_type) if token else None
+    return get_limit_arg(), after
+
+def get_layout():
+    """Return 'columns' for ?layout=columns ({"columns": [...], "rows": [[...], ...]}), otherwise 'rows'"""
+    layout = request.args.get('layout', 'rows').lower()
+    if layout not in ('rows', 'columns'):
+        raise InvalidRequestError("layout must be rows or columns.")
+    return layout
+
+def layout_cursor(connection, layout, **kwargs):
+    """Dictionary cursor for the default layout; plain tuple cursor for the columnar one, so no per-row dicts are built"""
+    return connection.cursor(dictionary=layout == 'rows', **kwargs)
+
+def layout_columns(cursor, layout):
+    """Column names for the columnar layout (read before closing the cursor, which forgets them), otherwise None"""
+    return list(cursor.column_names) if layout == 'columns' else None
+
+def layout_payload(rows, columns):
+    if columns is not None:
+        return {"columns": columns, "rows": rows}
+    return rows
+
+# Field projection: ?fields= names the columns to SELECT, so MySQL never reads or sends the rest
+HOME_COLUMNS = (
+    'home_id', 'homeowner_id', 'home_name', 'house_age', 'house_use', 'renovations', 'type_of_house', 'num_floor', 'lot_area',
+    'floor_area', 'selected_house_type', 'selected_material', 'selected_flooring', 'selected_wall', 'selected_ceiling',
+    'latitude', 'longitude', 'is_default', 'date_created', 'updated_at'
+)
+HOMEOWNER_COLUMNS = ('homeowner_id', 'default_home_id')
+
+def get_fields(allowed, required=()):
+    """Read ?fields=a,b into a SELECT column list drawn from allowed; '*' when absent
+
+    Columns in required (the paging key) are always selected, first, so the next cursor can be built.
+    """
+    value = request.args.get('fields')
+    if not value:
+        return '*'
+    fields = list(required)
+    for field in value.split(','):
+        field = field.strip()
+        if field not in allowed:
+            raise InvalidRequestError("Unknown field %r; fields must be drawn from %s." % (field, ', '.join(allowed)))
+        if field not in fields:
+            fields.append(field)
+    # Safe to interpolate: every name was matched against the whitelist above
+    return ', '.join('`%s`' % field for field in fields)
+
+def paginated_response(scope, rows, limit, key, columns=None):
+    """Render one page (fetched with LIMIT limit + 1) and advertise the next page in X-Next-Cursor and Link"""
+    has_more = len(rows) > limit
+    rows = rows[:limit]
+    response = render(layout_payload(rows, columns))
+    if has_more:
+        # key is a column name, or a tuple of them for a (sort column, primary key) keyset
+        keys = key if isinstance(key, tuple) else (key,)
+        last = [rows[-1][columns.index(k)] if columns is not None else rows[-1][k] for k in keys]
+        last = [value.isoformat() if isinstance(value, datetime) else value for value in last]
+        link_next_page(response, encode_cursor(scope, last if isinstance(key, tuple) else last[0]))
+    return response
+
+def link_next_page(response, token):
+    """Advertise the page after this one in X-Next-Cursor and a Link header repeating the current arguments"""
+    args = request.args.to_dict()
+    args['cursor'] = token
+    response.headers['X-Next-Cursor'] = token
+    response.headers['Link'] = '<%s?%s>; rel="next"' % (request.path, urlencode(args))
+
+# Streaming exports: rows are pulled from an unbuffered cursor this many at a time
+STREAM_BATCH_SIZE = int(os.getenv('STREAM_BATCH_SIZE', 500))
+
+def get_stream_format():
+    """Return 'ndjson', 'json' or 'msgpack' when the client asked for a streamed export, otherwise None"""
+    stream = request.args.get('stream', '').lower()
+    if stream not in ('', '0', 'false', '1', 'true', 'json', 'ndjson'):
+        raise InvalidRequestError("stream must be one of 1, json or ndjson.")
+    accepted = request.accept_mimetypes.best_match(['application/json', 'application/x-ndjson'])
+    if stream == 'ndjson' or accepted == 'application/x-ndjson':
+        return 'ndjson'
+    if stream in ('1', 'true', 'json'):
+        return 'msgpack' if response_format() == 'msgpack' else 'json'
+    return None
+
+def stream_rows(cursor, stream_format, layout='rows'):
+    """Yield encoded rows from an unbuffered cursor batch by batch, so only one batch is ever in memory
+
+    With layout='columns' the column names go out once (as the first NDJSON line or MessagePack
+    object, or as the "columns" member of the JSON object) and every row is a bare array. The
+    MessagePack stream is a plain sequence of objects, read with msgpack.Unpacker.
+    """
+    try:
+        if layout == 'columns':
+            if stream_format == 'msgpack':
+                yield pack(list(cursor.column_names))
+            else:
+                columns = app.json.dumps(list(cursor.column_names), separators=(',', ':'))
+                yield columns + '\n' if stream_format == 'ndjson' else '{"columns":%s,"rows":[' % columns
+        elif stream_format == 'json':
+            yield '['
+        first = True
+        stats = request_stats()
+        while True:
+            rows = cursor.fetchmany(STREAM_BATCH_SIZE)
+            if not rows:
+                break
+            start = time.perf_counter()
+            if stream_format == 'msgpack':
+                chunk = b''.join(pack(row) for row in rows)
+            elif stream_format == 'ndjson':
+                chunk = ''.join(app.json.dumps(row, separators=(',', ':')) + '\n' for row in rows)
+            else:
+                chunk = ','.join(app.json.dumps(row, separators=(',', ':')) for row in rows)
+                chunk = chunk if first else ',' + chunk
+                first = False
+            stats.serialize += time.perf_counter() - start
+            yield chunk
+        if stream_format == 'json':
+            yield ']}' if layout == 'columns' else ']'
+    except GeneratorExit:
+        # The client stopped reading mid-export: stop MySQL sending the rest too
+        cursor.cancel('disconnect')
+        raise
+    finally:
+        try:
+            cursor.close()
+        except Exception:
+            # Client went away mid-export; the pool discards the connection with its unread rows
+            pass
+
+def streamed_response(cursor, stream_format, layout='rows'):
+    # A deadline kill now would truncate a body whose 200 is already out, and still looks complete
+    request_stats().deadline = None
+    mimetype = {'ndjson': 'application/x-ndjson', 'msgpack': 'application/msgpack'}.get(stream_format, 'application/json')
+    return Response(stream_with_context(stream_rows(cursor, stream_format, layout)), mimetype=mimetype)
+
+# Response compression
+COMPRESS_MIN_BYTES = int(os.getenv('COMPRESS_MIN_BYTES', 1024))  # Smaller bodies are sent as is
+GZIP_LEVEL = int(os.getenv('GZIP_LEVEL', 6))
+BROTLI_QUALITY = int(os.getenv('BROTLI_QUALITY', 5))
+ZSTD_LEVEL = int(os.getenv('ZSTD_LEVEL', 3))
+COMPRESSIBLE_MIMETYPES = ('application/json', 'application/x-ndjson', 'application/msgpack', 'text/plain', 'text/event-stream')
+
+def gzip_compressor():
+    compressor = zlib.compressobj(GZIP_LEVEL, zlib.DEFLATED, 31)  # wbits 31: gzip container
+    return lambda chunk: compressor.compress(chunk) + compressor.flush(zlib.Z_SYNC_FLUSH), compressor.flush
+
+def brotli_compressor():
+    compressor = brotli.Compressor(quality=BROTLI_QUALITY)
+    return lambda chunk: compressor.process(chunk) + compressor.flush(), compressor.finish
+
+def zstd_compressor():
+    compressor = zstandard.ZstdCompressor(level=ZSTD_LEVEL).compressobj()
+    return lambda chunk: compressor.compress(chunk) + compressor.flush(zstandard.COMPRESSOBJ_FLUSH_BLOCK), compressor.flush
+
+# Content-Encoding -> factory of (compress chunk and flush, finish), in server preference order
+COMPRESSORS = OrderedDict()
+if zstandard:
+    COMPRESSORS['zstd'] = zstd_compressor
+if brotli:
+    COMPRESSORS['br'] = brotli_compressor
+COMPRESSORS['gzip'] = gzip_compressor
+
+def negotiate_encoding():
+    """Pick the client's highest-quality Content-Encoding we support, ties going to server preference"""
+    best, best_quality = None, 0
+    for encoding in COMPRESSORS:
+        quality = request.accept_encodings[encoding]
+        if quality > best_quality:
+            best, best_quality = encoding, quality
+    return best
+
+def compress_stream(chunks, compressor):
+    """Compress a streamed body chunk by chunk, flushing each so clients still get rows as they are produced"""
+    process, finish = compressor
+    try:
+        for chunk in chunks:
+            if isinstance(chunk, str):
+                chunk = chunk.encode()
+            data = process(chunk)
+            if data:
+                yield data
+        yield finish()
+    finally:
+        if hasattr(chunks, 'close'):
+            chunks.close()
+
+@app.after_request
+def compress_response(response):
+    if (
+        response.status_code < 200 or response.status_code in (204, 304)
+        or 'Content-Encoding' in response.headers
+        or response.mimetype not in COMPRESSIBLE_MIMETYPES
+        or request.method == 'HEAD'
+    ):
+        return response
+    response.vary.add('Accept-Encoding')
+    encoding = negotiate_encoding()
+    if encoding is None:
+        return response
+    if response.is_streamed:
+        response.response = compress_stream(response.response, COMPRESSORS[encoding]())
+        response.headers.pop('Content-Length', None)
+    else:
+        body = response.get_data()
+        if len(body) < COMPRESS_MIN_BYTES:
+            return response
+        process, finish = COMPRESSORS[encoding]()
+        response.set_data(process(body) + finish())
+    response.headers['Content-Encoding'] = encoding
+    etag, weak = response.get_etag()
+    if etag:
+        response.set_etag('%s-%s' % (etag, encoding), weak)
+    return response
+
+# Homeowner data versions, shared by every worker on the host through a memory-mapped file
+VERSION_TABLE_PATH = os.getenv('VERSION_TABLE_PATH', os.path.join(tempfile.gettempdir(), 'inspectify-homeowner-versions'))
+VERSION_TABLE_SLOTS = int(os.getenv('VERSION_TABLE_SLOTS', 65536))
+
+def unix_micros():
+    return int(time.time() * 1000000)
+
+class VersionTable:
+    """Change counters and modification times per homeowner, bumped after every committed write touching it
+
+    Homeowner ids hash into a fixed number of slots, so a collision only costs a spurious
+    invalidation. The header holds a random generation (so counters restarting from zero with a
+    fresh file never repeat an old ETag), a global epoch bumped when the whole database is reset,
+    and the table's creation time, the earliest Last-Modified it can vouch for.
+    """
+
+    HEADER = struct.Struct('<QQQQ')  # generation, epoch, epoch modified at, created at
+    SLOT = struct.Struct('<QQ')  # counter, modified at (times are unix microseconds)
+
+    def __init__(self, path, slots):
+        self.pid = os.getpid()
+        self.slots = slots
+        size = self.HEADER.size + slots * self.SLOT.size
+        self._file = open(path, 'a+b')
+        self._lock = threading.Lock()
+        with self._locked():
+            if os.fstat(self._file.fileno()).st_size != size:
+                self._file.truncate(0)
+                self._file.truncate(size)
+            self._map = mmap.mmap(self._file.fileno(), size)
+            if self.HEADER.unpack_from(self._map, 0)[0] == 0:
+                self.HEADER.pack_into(self._map, 0, int.from_bytes(os.urandom(8), 'little') | 1, 0, 0, unix_micros())
+
+    @contextlib.contextmanager
+    def _locked(self):
+        with self._lock:
+            if fcntl:
+                fcntl.flock(self._file, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                if fcntl:
+                    fcntl.flock(self._file, fcntl.LOCK_UN)
+
+    def _slot(self, homeowner_id):
+        return self.HEADER.size + zlib.crc32(str(homeowner_id).encode()) % self.slots * self.SLOT.size
+
+    def get(self, homeowner_id):
+        """Opaque version of homeowner_id's data: changes after every write touching it"""
+        generation, epoch = self.HEADER.unpack_from(self._map, 0)[:2]
+        return generation, epoch, self.SLOT.unpack_from(self._map, self._slot(homeowner_id))[0]
+
+    def modified_at(self, homeowner_id):
+        """Unix time of the last write touching homeowner_id (or anything older this table cannot rule out)"""
+        epoch_modified_at, created_at = self.HEADER.unpack_from(self._map, 0)[2:]
+        return max(self.SLOT.unpack_from(self._map, self._slot(homeowner_id))[1], epoch_modified_at, created_at) / 1e6
+
+    def bump(self, homeowner_id):
+        offset = self._slot(homeowner_id)
+        with self._locked():
+            counter = self.SLOT.unpack_from(self._map, offset)[0]
+            self.SLOT.pack_into(self._map, offset, counter + 1, unix_micros())
+
+    def bump_all(self):
+        with self._locked():
+            generation, epoch, _, created_at = self.HEADER.unpack_from(self._map, 0)
+            self.HEADER.pack_into(self._map, 0, generation, epoch + 1, unix_micros(), created_at)
+
+    def epoch(self):
+        return self.HEADER.unpack_from(self._map, 0)[1]
+
+_versions = None
+
+def get_versions():
+    """Return this process's handle on the shared version table (reopened after a fork for its own file lock)"""
+    global _versions
+    if _versions is None or _versions.pid != os.getpid():
+        _versions = VersionTable(VERSION_TABLE_PATH, VERSION_TABLE_SLOTS)
+    return _versions
+
+# Response cache for per-homeowner reads
+RESPONSE_CACHE_MAX_ENTRIES = int(os.getenv('RESPONSE_CACHE_MAX_ENTRIES', 10000))
+RESPONSE_CACHE_MAX_BYTES = int(os.getenv('RESPONSE_CACHE_MAX_BYTES', 64 * 1024 * 1024))
+RESPONSE_CACHE_TTL = float(os.getenv('RESPONSE_CACHE_TTL', 300))  # Seconds
+RESPONSE_CACHE_GZIP_MIN_BYTES = int(os.getenv('RESPONSE_CACHE_GZIP_MIN_BYTES', 1024))  # 0 disables pre-gzipping
+CACHED_HEADERS = ('X-Next-Cursor', 'Link', 'X-Truncated')
+
+class CachedResponse:
+    """Encoded response body (and its gzipped form when worth it) for one cache key"""
+
+    def __init__(self, homeowner_id, version, status, mimetype, body, headers, expires_at):
+        self.homeowner_id = homeowner_id
+        self.version = version
+        self.status = status
+        self.mimetype = mimetype
+        self.body = body
+        self.gzipped = None
+        if RESPONSE_CACHE_GZIP_MIN_BYTES and len(body) >= RESPONSE_CACHE_GZIP_MIN_BYTES:
+            self.gzipped = gzip.compress(body, compresslevel=6)
+        self.headers = headers
+        self.expires_at = expires_at
+        self.size = len(body) + len(self.gzipped or b'')
+
+    def to_response(self, cache_status, etag=None, last_modified=None):
+        """Build the response; without an etag (POST results) no validators are sent"""
+        if self.gzipped is not None and request.accept_encodings['gzip']:
+            response = Response(self.gzipped, status=self.status, mimetype=self.mimetype)
+            response.headers['Content-Encoding'] = 'gzip'
+            if etag is not None:
+                etag += '-gzip'
+        else:
+            response = Response(self.body, status=self.status, mimetype=self.mimetype)
+        response.headers.update(self.headers)
+        response.vary.update(('Accept', 'Accept-Encoding'))
+        response.headers['X-Cache'] = cache_status
+        if self.status == 200 and etag is not None:
+            response.set_etag(etag)
+            if last_modified is not None:
+                response.last_modified = last_modified
+            response.headers['Cache-Control'] = 'private, no-cache'
+        return response
+
+class ResponseCache:
+    """In-process LRU of encoded responses, bounded by entry count, total bytes and TTL
+
+    Entries remember the homeowner version they were built from, so a write from any worker
+    makes them stale; writes from this worker also drop them eagerly through invalidate().
+    """
+
+    def __init__(self, max_entries, max_bytes, ttl):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()  # key -> CachedResponse, least recently used first
+        self._keys_by_homeowner = {}
+        self._bytes = 0
+        self._hits = 0
+        self._misses = 0
+        self._evictions = 0
+        self._expirations = 0
+        self._invalidations = 0
+
+    def _remove(self, key):
+        entry = self._entries.pop(key)
+        self._bytes -= entry.size
+        keys = self._keys_by_homeowner.get(entry.homeowner_id)
+        if keys is not None:
+            keys.discard(key)
+            if not keys:
+                del self._keys_by_homeowner[entry.homeowner_id]
+
+    def get(self, key, version):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry.version != version:
+                self._remove(key)
+                self._invalidations += 1
+                entry = None
+            elif entry is not None and entry.expires_at <= time.monotonic():
+                self._remove(key)
+                self._expirations += 1
+                entry = None
+            if entry is None:
+                self._misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self._hits += 1
+            return entry
+
+    def put(self, key, homeowner_id, version, response):
+        headers = {name: response.headers[name] for name in CACHED_HEADERS if name in response.headers}
+        entry = CachedResponse(
+            homeowner_id, version, response.status_code, response.mimetype, response.get_data(), headers,
+            time.monotonic() + self.ttl
+        )
+        if entry.size > self.max_bytes:
+            return entry
+        with self._lock:
+            if key in self._entries:
+                self._remove(key)
+            self._entries[key] = entry
+            self._keys_by_homeowner.setdefault(homeowner_id, set()).add(key)
+            self._bytes += entry.size
+            while len(self._entries) > self.max_entries or self._bytes > self.max_bytes:
+                self._remove(next(iter(self._entries)))
+                self._evictions += 1
+        return entry
+
+    def invalidate(self, homeowner_id):
+        with self._lock:
+            for key in list(self._keys_by_homeowner.get(homeowner_id, ())):
+                self._remove(key)
+                self._invalidations += 1
+
+    def clear(self):
+        with self._lock:
+            self._invalidations += len(self._entries)
+            self._entries.clear()
+            self._keys_by_homeowner.clear()
+            self._bytes = 0
+
+    def stats(self):
+        with self._lock:
+            return {
+                "entries": len(self._entries),
+                "bytes": self._bytes,
+                "hits": self._hits,
+                "misses": self._misses,
+                "evictions": self._evictions,
+                "expirations": self._expirations,
+                "invalidations": self._invalidations
+            }
+
+response_cache = ResponseCache(RESPONSE_CACHE_MAX_ENTRIES, RESPONSE_CACHE_MAX_BYTES, RESPONSE_CACHE_TTL)
+
+def homeowner_etag(key, version):
+    """Strong ETag for one per-homeowner read at one homeowner version"""
+    return hashlib.blake2b(repr((key, version)).encode(), digest_size=16).hexdigest()
+
+def not_modified(etag, last_modified):
+    """Return the ETag to echo in a 304 when the client's validators match the current version, otherwise None"""
+    if request.if_none_match:
+        for candidate in [etag] + ['%s-%s' % (etag, encoding) for encoding in COMPRESSORS]:
+            if request.if_none_match.contains_weak(candidate):
+                return candidate
+        return None
+    if request.if_modified_since is not None and last_modified is not None and last_modified <= request.if_modified_since:
+        return etag
+    return None
+
+def cached_homeowner_response(homeowner_id, build):
+    """Serve a per-homeowner read from the response cache, or build it and cache the encoded bytes
+
+    Conditional requests whose validators still match get a 304 straight from the shared
+    version table, without touching MySQL or the cache.
+    """
+    key = (request.endpoint, homeowner_id, request.query_string, response_format())
+    versions = get_versions()
+    # Read the version before querying: a write committed meanwhile leaves this entry already stale
+    version = versions.get(homeowner_id)
+    etag = homeowner_etag(key, version)
+    # HTTP dates count whole seconds: while the second of the last write is still running, another write
+    # would leave Last-Modified unchanged, so none is sent (the ETag alone validates) until it is over
+    modified = math.floor(versions.modified_at(homeowner_id))
+    last_modified = datetime.fromtimestamp(modified, timezone.utc) if modified + 1 <= time.time() else None
+    matched_etag = not_modified(etag, last_modified)
+    if matched_etag:
+        response = Response(status=304)
+        response.set_etag(matched_etag)
+        if last_modified is not None:
+            response.last_modified = last_modified
+        response.vary.update(('Accept', 'Accept-Encoding'))
+        response.headers['Cache-Control'] = 'private, no-cache'
+        return response
+    entry = response_cache.get(key, version)
+    if entry is not None:
+        return entry.to_response('HIT', etag, last_modified)
+    response = make_response(build())
+    if response.status_code not in (200, 404):
+        return response
+    return response_cache.put(key, homeowner_id, version, response).to_response('MISS', etag, last_modified)
+
+def homeowner_changed(homeowner_id):
+    """Record a committed write touching homeowner_id so cached reads of it are never served again"""
+    get_versions().bump(homeowner_id)
+    response_cache.invalidate(homeowner_id)
+
+# Table data versions for the /sqlQuery result cache, in a VersionTable of their own keyed by table name
+TABLE_VERSION_PATH = os.getenv('TABLE_VERSION_PATH', os.path.join(tempfile.gettempdir(), 'inspectify-table-versions'))
+TABLE_VERSION_SLOTS = 64
+
+_table_versions = None
+
+def get_table_versions():
+    global _table_versions
+    if _table_versions is None or _table_versions.pid != os.getpid():
+        _table_versions = VersionTable(TABLE_VERSION_PATH, TABLE_VERSION_SLOTS)
+    return _table_versions
+
+def tables_changed(*tables):
+    """Record a committed write to tables so cached /sqlQuery results reading them are never served again"""
+    versions = get_table_versions()
+    for table in tables:
+        versions.bump(table.lower())
+
+# Schema migrations
+def run_sql(*statements):
+    """Migration step that always runs the given statements"""
+    def step(cursor):
+        return list(statements)
+    return step
+
+# Default DDL clause: build in place while reads and writes keep flowing
+ONLINE_DDL = 'ALGORITHM=INPLACE, LOCK=NONE'
+
+def create_index(table, name, columns, kind='INDEX', ddl=ONLINE_DDL):
+    """Migration step adding an index (online unless ddl says otherwise), skipped if it exists"""
+    def step(cursor):
+        cursor.execute(
+            "SELECT 1 FROM information_schema.STATISTICS WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = %s AND INDEX_NAME = %s LIMIT 1",
+            (table, name)
+        )
+        if cursor.fetchone():
+            return []
+        return ["ALTER TABLE %s ADD %s %s (%s), %s" % (table, kind, name, ', '.join(columns), ddl)]
+    return step
+
+def add_column(table, column, definition, ddl=ONLINE_DDL):
+    """Migration step adding a column (online unless ddl says otherwise), skipped if it exists"""
+    def step(cursor):
+        cursor.execute(
+            "SELECT 1 FROM information_schema.COLUMNS WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = %s AND COLUMN_NAME = %s LIMIT 1",
+            (table, column)
+        )
+        if cursor.fetchone():
+            return []
+        return ["ALTER TABLE %s ADD COLUMN %s %s, %s" % (table, column, definition, ddl)]
+    return step
+
+# (version, description, steps) in the order they must be applied; never edit a released entry, append a new one
+MIGRATIONS = [
+    (1, "Create Homeowner and Home tables", [run_sql(
+        """
+            CREATE TABLE IF NOT EXISTS Homeowner (
                 homeowner_id VARCHAR(50) PRIMARY KEY
             );
-        """)
-
-        # Recreate Home table
-        cursor.execute("""
-            CREATE TABLE Home (
+        """,
+        """
+            CREATE TABLE IF NOT EXISTS Home (
                 home_id INT PRIMARY KEY AUTO_INCREMENT,
                 homeowner_id VARCHAR(50) NOT NULL,
                 home_name VARCHAR(100) NOT NULL,
@@ -60,34 +1422,256 @@ def initialize_database():
                 date_created DATETIME NOT NULL DEFAULT CURRENT_TIMESTAMP,
                 FOREIGN KEY (homeowner_id) REFERENCES Homeowner(homeowner_id) ON DELETE CASCADE
             );
+        """
+    )]),
+    (2, "Index Home(homeowner_id, is_default) for per-homeowner and default home lookups",
+        [create_index('Home', 'idx_home_homeowner_default', ['homeowner_id', 'is_default'])]),
+    (3, "Index Home(date_created) for date range filters",
+        [create_index('Home', 'idx_home_date_created', ['date_created'])]),
+    # No foreign key: Home already cascades from Homeowner, and a cycle would block DROP TABLE Home in init_db
+    (4, "Track each homeowner's default home in Homeowner.default_home_id", [
+        add_column('Homeowner', 'default_home_id', 'INT NULL'),
+        run_sql("""
+            UPDATE Homeowner o
+            JOIN (SELECT homeowner_id, MAX(home_id) AS home_id FROM Home WHERE is_default = TRUE GROUP BY homeowner_id) d
+                ON d.homeowner_id = o.homeowner_id
+            SET o.default_home_id = d.home_id;
         """)
+    ]),
+    # A stored generated column is filled for existing rows by the ALTER and kept current on every write.
+    # It is INVISIBLE so SELECT * keeps returning the JSON-friendly columns. Homes without coordinates sit
+    # at POINT(0 0) because a SPATIAL index needs NOT NULL; queries filter them out on latitude IS NOT NULL.
+    # Neither a stored column nor a SPATIAL index can be built with LOCK=NONE: writes to Home wait meanwhile.
+    (5, "Add Home.location POINT with a SPATIAL index", [
+        add_column(
+            'Home', 'location',
+            'POINT GENERATED ALWAYS AS (POINT(COALESCE(longitude, 0), COALESCE(latitude, 0))) STORED NOT NULL SRID 0 INVISIBLE',
+            ddl='ALGORITHM=COPY, LOCK=SHARED'
+        ),
+        create_index('Home', 'idx_home_location', ['location'], kind='SPATIAL INDEX', ddl='ALGORITHM=INPLACE, LOCK=SHARED')
+    ]),
+    # Covers GET /homes/<homeowner_id>?fields=home_id,home_name,latitude,longitude (the map screen) without touching rows
+    (6, "Covering index Home(homeowner_id, home_id, home_name, latitude, longitude) for map projections",
+        [create_index('Home', 'idx_home_homeowner_map', ['homeowner_id', 'home_id', 'home_name', 'latitude', 'longitude'])]),
+    (7, "Index the Home columns GET /homes filters on", [
+        create_index('Home', 'idx_home_type_of_house', ['type_of_house']),
+        create_index('Home', 'idx_home_house_use', ['house_use']),
+        create_index('Home', 'idx_home_selected_material', ['selected_material']),
+        create_index('Home', 'idx_home_num_floor', ['num_floor'])
+    ]),
+    # Existing rows get the migration time as updated_at, so the first delta sync after it is a full one
+    (8, "Track Home.updated_at and record deleted homes in HomeTombstone for delta sync", [
+        add_column('Home', 'updated_at', 'DATETIME(6) NOT NULL DEFAULT CURRENT_TIMESTAMP(6) ON UPDATE CURRENT_TIMESTAMP(6)'),
+        create_index('Home', 'idx_home_homeowner_updated', ['homeowner_id', 'updated_at']),
+        run_sql("""
+            CREATE TABLE IF NOT EXISTS HomeTombstone (
+                home_id INT PRIMARY KEY,
+                homeowner_id VARCHAR(50) NOT NULL,
+                deleted_at DATETIME(6) NOT NULL DEFAULT CURRENT_TIMESTAMP(6),
+                INDEX idx_tombstone_homeowner_deleted (homeowner_id, deleted_at)
+            );
+        """)
+    ]),
+    # Append-only outbox behind GET /changes/stream, written in the same transaction as each Home write
+    (9, "Create the HomeChange outbox", [run_sql("""
+        CREATE TABLE IF NOT EXISTS HomeChange (
+            change_id BIGINT PRIMARY KEY AUTO_INCREMENT,
+            home_id INT NOT NULL,
+            homeowner_id VARCHAR(50) NOT NULL,
+            operation ENUM('insert', 'update', 'delete') NOT NULL,
+            changed_at DATETIME(6) NOT NULL DEFAULT CURRENT_TIMESTAMP(6)
+        );
+    """)]),
+]
+
+# Tables dropped by initialize_database, children before parents
+MANAGED_TABLES = ['HomeChange', 'HomeTombstone', 'Home', 'Homeowner', 'schema_version']
+
+MIGRATION_LOCK_NAME = 'inspectify_schema_migrations'
+MIGRATION_LOCK_TIMEOUT = int(os.getenv('MIGRATION_LOCK_TIMEOUT', 60))
+
+class MigrationError(Exception):
+    """Raised when a migration step fails; earlier migrations stay applied and recorded"""
 
+def migrate(dry_run=False, target=None):
+    """Apply pending MIGRATIONS in order, returning what ran (or, on a dry run, what would run)"""
+    connection = get_db_connection()
+    cursor = connection.cursor(buffered=True)
+    # Serialize workers and deploys that start migrating at the same time
+    cursor.execute("SELECT GET_LOCK(%s, %s)", (MIGRATION_LOCK_NAME, MIGRATION_LOCK_TIMEOUT))
+    if cursor.fetchone()[0] != 1:
+        cursor.close()
+        raise MigrationError("Another migration is running.")
+    applied = False
+    try:
+        cursor.execute(
+            "SELECT 1 FROM information_schema.TABLES WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = 'schema_version'"
+        )
+        if cursor.fetchone():
+            cursor.execute("SELECT COALESCE(MAX(version), 0) FROM schema_version")
+            current = cursor.fetchone()[0]
+        elif dry_run:
+            current = 0
+        else:
+            cursor.execute("""
+                CREATE TABLE schema_version (
+                    version INT PRIMARY KEY,
+                    description VARCHAR(255) NOT NULL,
+                    applied_at DATETIME NOT NULL DEFAULT CURRENT_TIMESTAMP
+                );
+            """)
+            current = 0
+
+        plan = []
+        for version, description, steps in MIGRATIONS:
+            if version <= current or (target is not None and version > target):
+                continue
+            statements = []
+            try:
+                for step in steps:
+                    step_statements = step(cursor)
+                    if not dry_run:
+                        for statement in step_statements:
+                            cursor.execute(statement)
+                    statements.extend(' '.join(statement.split()) for statement in step_statements)
+                if not dry_run:
+                    cursor.execute("INSERT INTO schema_version (version, description) VALUES (%s, %s)", (version, description))
+                    connection.commit()
+                    applied = True
+            except mysql.connector.Error as e:
+                connection.rollback()
+                raise MigrationError("Migration %d (%s) failed: %s" % (version, description, e))
+            plan.append({"version": version, "description": description, "statements": statements})
+            if not dry_run:
+                print("Applied migration %d: %s" % (version, description))
+                current = version
+        return {"dry_run": dry_run, "current_version": current, "migrations": plan}
+    finally:
+        cursor.execute("SELECT RELEASE_LOCK(%s)", (MIGRATION_LOCK_NAME,))
+        cursor.close()
+        if not dry_run and applied:
+            # New columns and backfills change response bodies, even if a later migration failed
+            invalidate_all()
+
+def invalidate_all():
+    """Make every cached response and validator stale, in every worker on the host"""
+    get_versions().bump_all()
+    get_table_versions().bump_all()
+    response_cache.clear()
+    sql_query_cache.clear()
+
+def initialize_database():
+    """Drop existing tables and recreate them by replaying every migration"""
+    try:
+        connection = get_db_connection()
+        cursor = connection.cursor()
+
+        # Drop tables if they exist
+        for table in MANAGED_TABLES:
+            cursor.execute("DROP TABLE IF EXISTS %s;" % table)
         connection.commit()
         cursor.close()
-        connection.close()
-        print("Database initialized: Homeowner and Home tables recreated successfully.")
+
+        migrate()
+        print("Database initialized: tables recreated successfully.")
     
     except Exception as e:
         print("Error initializing database:", e)
 
+@app.cli.command('migrate')
+@click.option('--dry-run', is_flag=True, help="Print pending migrations without applying them.")
+@click.option('--target', type=int, default=None, help="Stop after this schema version.")
+def migrate_command(dry_run, target):
+    """Apply pending schema migrations (flask --app main migrate)"""
+    result = migrate(dry_run=dry_run, target=target)
+    for migration in result["migrations"]:
+        print("%s %d: %s" % ("Pending" if dry_run else "Applied", migration["version"], migration["description"]))
+        for statement in migration["statements"]:
+            print("    " + statement)
+    print("Schema version: %d" % result["current_version"])
+
 @app.route('/init_db')
 def init_db():
     if request.headers.get('X-API-KEY') != API_KEY:
         return jsonify({"error": "Unauthorized"}), 401
+    stats = request_stats()
+    stats.deadline = stats.check = None  # Never kill DDL halfway
     initialize_database()
+    invalidate_all()
     return jsonify({"message": "Database initialized."})
 
+@app.route('/migrate', methods=['GET', 'POST'])
+def migrate_schema():
+    """GET shows the pending migrations (dry run); POST applies them"""
+    if request.headers.get('X-API-KEY') != API_KEY:
+        return jsonify({"error": "Unauthorized"}), 401
+    stats = request_stats()
+    stats.deadline = stats.check = None  # Table-copying ALTERs can run for minutes; never kill DDL halfway
+    try:
+        target = request.args.get('target', type=int)
+        return jsonify(migrate(dry_run=request.method == 'GET', target=target))
+    except MigrationError as e:
+        return jsonify({"error": str(e)}), 500
+
+@app.route('/pool_stats', methods=['GET'])
+def pool_stats():
+    if request.headers.get('X-API-KEY') != API_KEY:
+        return jsonify({"error": "Unauthorized"}), 401
+    return jsonify(get_pool().stats())
+
+@app.route('/metrics', methods=['GET'])
+def metrics():
+    """Prometheus scrape endpoint; takes the API key as X-API-KEY or as a bearer token"""
+    if request.headers.get('X-API-KEY') != API_KEY and request.headers.get('Authorization') != 'Bearer %s' % API_KEY:
+        return jsonify({"error": "Unauthorized"}), 401
+    return Response(get_metrics().render(), mimetype='text/plain; version=0.0.4')
+
+QUERY_STATS_ORDERS = ('total', 'avg', 'p95', 'max', 'count', 'rows')
+
+@app.route('/query_stats', methods=['GET'])
+def query_stats():
+    """Statement fingerprints across all workers, top ?limit= by ?order= (total time by default)"""
+    if request.headers.get('X-API-KEY') != API_KEY:
+        return jsonify({"error": "Unauthorized"}), 401
+    order = request.args.get('order', 'total')
+    if order not in QUERY_STATS_ORDERS:
+        raise InvalidRequestError("order must be one of %s." % ', '.join(QUERY_STATS_ORDERS))
+    try:
+        limit = int(request.args.get('limit', 20))
+    except ValueError:
+        raise InvalidRequestError("limit must be an integer.")
+    return jsonify({"slow_query_seconds": SLOW_QUERY_SECONDS, "queries": get_metrics().top_queries(limit, order)})
+
+@app.route('/cache_stats', methods=['GET'])
+def cache_stats():
+    if request.headers.get('X-API-KEY') != API_KEY:
+        return jsonify({"error": "Unauthorized"}), 401
+    stats = response_cache.stats()
+    stats["sql_query"] = sql_query_cache.stats()
+    return jsonify(stats)
+
 @app.route('/homeowners', methods=['GET'])
 def get_homeowners():
     if request.headers.get('X-API-KEY') != API_KEY:
         return jsonify({"error": "Unauthorized"}), 401
+    layout = get_layout()
+    fields = get_fields(HOMEOWNER_COLUMNS, required=('homeowner_id',))
+    stream_format = get_stream_format()
+    if stream_format:
+        cursor = layout_cursor(get_db_connection(), layout, buffered=False)
+        cursor.execute("SELECT %s FROM Homeowner ORDER BY homeowner_id" % fields)
+        return streamed_response(cursor, stream_format, layout)
+    limit, after = get_page_args('homeowners', str)
     connection = get_db_connection()
-    cursor = connection.cursor(dictionary=True)
-    cursor.execute("SELECT * FROM Homeowner")
-    all_homeowners = cursor.fetchall()
+    cursor = layout_cursor(connection, layout)
+    if after is None:
+        cursor.execute("SELECT %s FROM Homeowner ORDER BY homeowner_id LIMIT %%s" % fields, (limit + 1,))
+    else:
+        cursor.execute("SELECT %s FROM Homeowner WHERE homeowner_id > %%s ORDER BY homeowner_id LIMIT %%s" % fields, (after, limit + 1))
+    homeowners = cursor.fetchall()
+    columns = layout_columns(cursor, layout)
     cursor.close()
-    connection.close()
-    return jsonify(all_homeowners)
+    return paginated_response('homeowners', homeowners, limit, 'homeowner_id', columns)
 
 @app.route('/homeowners/<homeowner_id>', methods=['GET'])
 def get_homeowner(homeowner_id):
@@ -98,109 +1682,1252 @@ def get_homeowner(homeowner_id):
     cursor.execute("SELECT * FROM Homeowner WHERE homeowner_id = %s", (homeowner_id,))
     homeowner = cursor.fetchone()
     cursor.close()
-    connection.close()
-    return jsonify(homeowner)
+    return render(homeowner)
 
 @app.route('/homeowners', methods=['POST'])
 def add_homeowner():
     if request.headers.get('X-API-KEY') != API_KEY:
         return jsonify({"error": "Unauthorized"}), 401
-    homeowner_id = request.json['homeowner_id']
+    homeowner_id = get_request_payload()['homeowner_id']
     connection = get_db_connection()
     cursor = connection.cursor()
-    cursor.execute("INSERT INTO Homeowner (homeowner_id) VALUES (%s)", (homeowner_id,))
+    try:
+        cursor.execute("INSERT INTO Homeowner (homeowner_id) VALUES (%s)", (homeowner_id,))
+    except mysql.connector.IntegrityError as e:
+        if e.errno != errorcode.ER_DUP_ENTRY:
+            raise
+        return jsonify({"error": "Homeowner already exists.", "homeowner_id": homeowner_id}), 409
+    finally:
+        cursor.close()
     connection.commit()
-    cursor.close()
-    connection.close()
+    homeowner_changed(homeowner_id)
+    tables_changed('Homeowner')
     return jsonify({"homeowner_id": homeowner_id})
 
+# Batch homeowner registration: ids per request and ids per INSERT IGNORE
+HOMEOWNER_BATCH_MAX_ITEMS = int(os.getenv('HOMEOWNER_BATCH_MAX_ITEMS', 10000))
+HOMEOWNER_BATCH_CHUNK_SIZE = int(os.getenv('HOMEOWNER_BATCH_CHUNK_SIZE', 1000))
+
+@app.route('/homeowners/batch', methods=['POST'])
+def add_homeowners_batch():
+    if request.headers.get('X-API-KEY') != API_KEY:
+        return jsonify({"error": "Unauthorized"}), 401
+    data = get_request_payload()
+    ids = data.get('homeowner_ids') if isinstance(data, dict) else data
+    if not isinstance(ids, list) or not ids:
+        return jsonify({"error": "Expected a non-empty JSON array of homeowner_ids."}), 400
+    if len(ids) > HOMEOWNER_BATCH_MAX_ITEMS:
+        return jsonify({"error": "At most %d homeowner_ids per batch." % HOMEOWNER_BATCH_MAX_ITEMS}), 400
+    invalid = [homeowner_id for homeowner_id in ids if not isinstance(homeowner_id, str) or not 0 < len(homeowner_id) <= 50]
+    if invalid:
+        return jsonify({"error": "homeowner_ids must be strings of 1 to 50 characters.", "invalid": invalid[:100]}), 400
+    ids = list(dict.fromkeys(ids))  # Drop repeats, keep order
+
+    connection = get_db_connection()
+    created = []
+    existing = []
+    for start in range(0, len(ids), HOMEOWNER_BATCH_CHUNK_SIZE):
+        chunk = ids[start:start + HOMEOWNER_BATCH_CHUNK_SIZE]
+        placeholders = ', '.join(['%s'] * len(chunk))
+        cursor = connection.cursor()
+        try:
+            found = set()
+            new_ids = chunk
+            while new_ids:
+                # One round trip when every id is new; IGNORE keeps an existing id from failing the whole chunk
+                cursor.execute(
+                    "INSERT IGNORE INTO Homeowner (homeowner_id) VALUES %s" % ', '.join(['(%s)'] * len(new_ids)), new_ids
+                )
+                if cursor.rowcount == len(new_ids):
+                    break
+                # Some ids exist, perhaps registered concurrently: find which under a locking read, so none can be
+                # registered between it and the insert of the rest, and report only those inserted as created
+                connection.rollback()
+                cursor.execute("SELECT homeowner_id FROM Homeowner WHERE homeowner_id IN (%s) FOR UPDATE" % placeholders, chunk)
+                found = {homeowner_id for (homeowner_id,) in cursor.fetchall()}
+                new_ids = [homeowner_id for homeowner_id in chunk if homeowner_id not in found]
+            connection.commit()
+        except Exception:
+            connection.rollback()
+            raise
+        finally:
+            cursor.close()
+        for homeowner_id in new_ids:
+            homeowner_changed(homeowner_id)
+        if new_ids:
+            tables_changed('Homeowner')
+        created.extend(new_ids)
+        existing.extend(homeowner_id for homeowner_id in chunk if homeowner_id in found)
+
+    return render({"created": created, "existing": existing})
+
+# Filtering and sorting on the Home list routes. Every filtered column is indexed (InnoDB appends home_id to
+# secondary indexes, so an equality filter still pages in home_id order); sorts are limited to indexed NOT NULL
+# columns so keyset paging never needs a filesort over the whole table.
+HOME_FILTERS = {'type_of_house': str, 'house_use': str, 'selected_material': str, 'num_floor': int}  # ?column=a,b
+HOME_RANGE_FILTERS = {'num_floor': int, 'date_created': datetime.fromisoformat}  # ?column_min= / ?column_max=, inclusive
+HOME_SORTS = {'home_id': int, 'date_created': datetime.fromisoformat}  # ?sort=column or ?sort=-column
+FILTER_MAX_VALUES = int(os.getenv('FILTER_MAX_VALUES', 100))
+
+def parse_arg(name, value, kind):
+    try:
+        return kind(value.strip())
+    except ValueError:
+        raise InvalidRequestError("Invalid value %r for %s." % (value, name))
+
+def get_home_query():
+    """Read the filter and ?sort= arguments of a Home list route
+
+    Returns (conditions, params, keys, descending): parameterized WHERE terms, and the keyset that
+    orders and pages the result (the sort column, then home_id to break ties).
+    """
+    conditions, params = [], []
+    for column, kind in HOME_FILTERS.items():
+        value = request.args.get(column)
+        if value:
+            values = [parse_arg(column, item, kind) for item in value.split(',')]
+            if len(values) > FILTER_MAX_VALUES:
+                raise InvalidRequestError("At most %d values for %s." % (FILTER_MAX_VALUES, column))
+            conditions.append("%s IN (%s)" % (column, ', '.join(['%s'] * len(values))))
+            params.extend(values)
+    for column, kind in HOME_RANGE_FILTERS.items():
+        for suffix, operator in (('_min', '>='), ('_max', '<=')):
+            value = request.args.get(column + suffix)
+            if value:
+                conditions.append("%s %s %%s" % (column, operator))
+                params.append(parse_arg(column + suffix, value, kind))
+
+    sort = request.args.get('sort', 'home_id')
+    descending = sort.startswith('-')
+    column = sort.lstrip('-')
+    if column not in HOME_SORTS:
+        raise InvalidRequestError("sort must be one of %s, optionally prefixed with -." % ', '.join(HOME_SORTS))
+    keys = ('home_id',) if column == 'home_id' else (column, 'home_id')
+    return conditions, params, keys, descending
+
+def home_page_scope(keys, descending):
+    """Cursor scope of a Home list, so a cursor from one sort order is rejected by another"""
+    if keys == ('home_id',) and not descending:
+        return 'homes'
+    return 'homes:%s%s' % ('-' if descending else '', keys[0])
+
+def get_home_page_args(keys, descending):
+    """get_page_args for a sorted Home list: cursors carry every keyset column"""
+    if len(keys) == 1:
+        return get_page_args(home_page_scope(keys, descending), int)
+    limit, after = get_page_args(home_page_scope(keys, descending), list)
+    if after is not None:
+        try:
+            after = [HOME_SORTS[key](value) for key, value in zip(keys, after, strict=True)]
+        except (ValueError, TypeError):
+            raise InvalidRequestError("Invalid cursor.")
+    return limit, after
+
+def home_select(fields, conditions, params, keys, descending, after=None, limit=None):
+    """Build (sql, params) for a filtered Home list, continuing after the previous page's keyset values"""
+    conditions, params = list(conditions), list(params)
+    if after is not None:
+        comparison = '<' if descending else '>'
+        if len(keys) == 1:
+            conditions.append("%s %s %%s" % (keys[0], comparison))
+            params.append(after)
+        else:
+            # Row constructor comparison, which MySQL turns into a range scan on (sort column, home_id)
+            conditions.append("(%s) %s (%s)" % (', '.join(keys), comparison, ', '.join(['%s'] * len(keys))))
+            params.extend(after)
+    sql = "SELECT %s FROM Home" % fields
+    if conditions:
+        sql += " WHERE " + " AND ".join(conditions)
+    sql += " ORDER BY " + ', '.join(key + ' DESC' if descending else key for key in keys)
+    if limit is not None:
+        sql += " LIMIT %s"
+        params.append(limit)
+    return sql, params
+
 @app.route('/homes', methods=['GET'])
 def get_homes():
     if request.headers.get('X-API-KEY') != API_KEY:
         return jsonify({"error": "Unauthorized"}), 401
+    layout = get_layout()
+    conditions, params, keys, descending = get_home_query()
+    fields = get_fields(HOME_COLUMNS, required=keys)
+    stream_format = get_stream_format()
+    if stream_format:
+        cursor = layout_cursor(get_db_connection(), layout, buffered=False)
+        cursor.execute(*home_select(fields, conditions, params, keys, descending))
+        return streamed_response(cursor, stream_format, layout)
+    limit, after = get_home_page_args(keys, descending)
+    connection = get_db_connection()
+    cursor = layout_cursor(connection, layout)
+    cursor.execute(*home_select(fields, conditions, params, keys, descending, after, limit + 1))
+    homes = cursor.fetchall()
+    columns = layout_columns(cursor, layout)
+    cursor.close()
+    return paginated_response(home_page_scope(keys, descending), homes, limit, keys if len(keys) > 1 else keys[0], columns)
+
+# Proximity search
+EARTH_RADIUS_M = 6370986  # Radius ST_Distance_Sphere uses
+NEAR_DEFAULT_RADIUS_M = float(os.getenv('NEAR_DEFAULT_RADIUS_M', 1000))
+NEAR_MAX_RADIUS_M = float(os.getenv('NEAR_MAX_RADIUS_M', 50000))
+NEAR_DEFAULT_LIMIT = int(os.getenv('NEAR_DEFAULT_LIMIT', 20))
+NEAR_MAX_LIMIT = int(os.getenv('NEAR_MAX_LIMIT', 200))
+
+def get_float_arg(name, minimum, maximum, default=None):
+    value = request.args.get(name)
+    if value is None:
+        if default is None:
+            raise InvalidRequestError("%s is required." % name)
+        return default
+    try:
+        value = float(value)
+    except ValueError:
+        raise InvalidRequestError("%s must be a number." % name)
+    if not minimum <= value <= maximum:
+        raise InvalidRequestError("%s must be between %s and %s." % (name, minimum, maximum))
+    return value
+
+def bounding_box(lat, lon, radius):
+    """(min_lon, min_lat, max_lon, max_lat) of a box containing the circle, clamped to valid coordinates"""
+    dlat = math.degrees(radius / EARTH_RADIUS_M)
+    dlon = math.degrees(radius / (EARTH_RADIUS_M * max(math.cos(math.radians(lat)), 1e-6)))
+    return max(lon - dlon, -180.0), max(lat - dlat, -90.0), min(lon + dlon, 180.0), min(lat + dlat, 90.0)
+
+@app.route('/homes/near', methods=['GET'])
+def get_homes_near():
+    if request.headers.get('X-API-KEY') != API_KEY:
+        return jsonify({"error": "Unauthorized"}), 401
+    lat = get_float_arg('lat', -90, 90)
+    lon = get_float_arg('lon', -180, 180)
+    radius = get_float_arg('radius', 0, NEAR_MAX_RADIUS_M, NEAR_DEFAULT_RADIUS_M)
+    try:
+        limit = min(int(request.args.get('limit', NEAR_DEFAULT_LIMIT)), NEAR_MAX_LIMIT)
+    except ValueError:
+        raise InvalidRequestError("limit must be an integer.")
+    if limit < 1:
+        raise InvalidRequestError("limit must be positive.")
+    fields = get_fields(HOME_COLUMNS)
+
+    # MBRContains on the SPATIAL index narrows to the bounding box; exact sphere distance trims and orders
+    min_lon, min_lat, max_lon, max_lat = bounding_box(lat, lon, radius)
+    box = 'POLYGON((%r %r, %r %r, %r %r, %r %r, %r %r))' % (
+        min_lon, min_lat, max_lon, min_lat, max_lon, max_lat, min_lon, max_lat, min_lon, min_lat
+    )
     connection = get_db_connection()
     cursor = connection.cursor(dictionary=True)
-    cursor.execute("SELECT * FROM Home")
-    all_homes = cursor.fetchall()
+    cursor.execute("""
+        SELECT %s, ST_Distance_Sphere(location, POINT(%%s, %%s)) AS distance_m
+        FROM Home
+        WHERE MBRContains(ST_GeomFromText(%%s), location) AND latitude IS NOT NULL AND longitude IS NOT NULL
+        HAVING distance_m <= %%s
+        ORDER BY distance_m
+        LIMIT %%s
+    """ % fields, (lon, lat, box, radius, limit))
+    homes = cursor.fetchall()
     cursor.close()
-    connection.close()
-    return jsonify(all_homes)
+    return render(homes)
+
+# In-memory nearest-neighbour index over home coordinates (one per worker process)
+LOCATION_INDEX_CELL_DEGREES = float(os.getenv('LOCATION_INDEX_CELL_DEGREES', 0.05))  # About 5.5 km at the equator
+LOCATION_INDEX_REFRESH = float(os.getenv('LOCATION_INDEX_REFRESH', 30))  # Seconds between pulls of homes inserted elsewhere
+LOCATION_INDEX_REBUILD = float(os.getenv('LOCATION_INDEX_REBUILD', 3600))  # Seconds between full reloads
+NEAREST_DEFAULT_K = int(os.getenv('NEAREST_DEFAULT_K', 10))
+NEAREST_MAX_K = int(os.getenv('NEAREST_MAX_K', 100))
+METERS_PER_DEGREE = EARTH_RADIUS_M * math.pi / 180
+
+def haversine_m(lat, lon, lats, lons):
+    """Great-circle distance in meters from (lat, lon) to every point of the lats/lons arrays"""
+    lat1 = math.radians(lat)
+    lats = np.radians(lats)
+    a = np.sin((lats - lat1) / 2) ** 2 + math.cos(lat1) * np.cos(lats) * np.sin((np.radians(lons) - math.radians(lon)) / 2) ** 2
+    return 2 * EARTH_RADIUS_M * np.arcsin(np.sqrt(np.minimum(a, 1.0)))
+
+class HomeLocationIndex:
+    """Uniform latitude/longitude grid of home coordinates answering k-nearest queries
+
+    Each cell holds immutable numpy arrays (home_ids, lats, lons), and writers build a new cells
+    dict and swap it in rather than changing the current one, so searches can read it without
+    holding the lock while other threads add or drop homes. Homes added by this worker
+    appear immediately; homes inserted by other workers are pulled by home_id watermark every
+    LOCATION_INDEX_REFRESH seconds, and the whole index is reloaded every LOCATION_INDEX_REBUILD.
+    """
+
+    def __init__(self, cell_degrees):
+        self.pid = os.getpid()
+        self.cell = cell_degrees
+        self.columns = int(round(360 / cell_degrees))
+        self._lock = threading.Lock()
+        self._cells = {}  # row * columns + column -> (home_ids, lats, lons)
+        self._count = 0
+        self._watermark = 0  # Highest home_id read from MySQL
+        self._added_above_watermark = set()  # Homes this worker added that a refresh must not add again
+        self._pending = None  # Homes added while a full load runs, replayed onto the new grid
+        self._epoch = None
+        self._loaded_at = 0.0
+        self._refreshed_at = 0.0
+        self._refreshing = False
+        self.ready = False
+
+    def _cell_keys(self, lats, lons):
+        rows = ((lats + 90) // self.cell).astype(np.int64)
+        columns = ((lons + 180) // self.cell).astype(np.int64) % self.columns
+        return rows * self.columns + columns
+
+    def _insert(self, cells, home_ids, lats, lons):
+        keys = self._cell_keys(lats, lons)
+        order = np.argsort(keys, kind='stable')
+        keys, home_ids, lats, lons = keys[order], home_ids[order], lats[order], lons[order]
+        bounds = np.flatnonzero(np.diff(keys)) + 1
+        for start, end in zip(np.concatenate(([0], bounds)), np.concatenate((bounds, [len(keys)]))):
+            key = int(keys[start])
+            new = (home_ids[start:end], lats[start:end], lons[start:end])
+            old = cells.get(key)
+            cells[key] = new if old is None else tuple(np.concatenate(pair) for pair in zip(old, new))
+
+    def _fetch(self, cursor, after):
+        home_ids, lats, lons = array('q'), array('d'), array('d')
+        cursor.execute(
+            "SELECT home_id, latitude, longitude FROM Home WHERE home_id > %s AND latitude IS NOT NULL AND longitude IS NOT NULL",
+            (after,)
+        )
+        while True:
+            rows = cursor.fetchmany(STREAM_BATCH_SIZE)
+            if not rows:
+                break
+            for home_id, lat, lon in rows:
+                home_ids.append(home_id)
+                lats.append(lat)
+                lons.append(lon)
+        return np.frombuffer(home_ids, dtype=np.int64), np.frombuffer(lats), np.frombuffer(lons)
+
+    def load(self):
+        """Rebuild the grid from every located home in MySQL, off the request path"""
+        epoch = get_versions().epoch()
+        pool = get_pool()
+        try:
+            connection = pool.acquire()
+            try:
+                cursor = connection.cursor()
+                home_ids, lats, lons = self._fetch(cursor, 0)
+                cursor.close()
+            finally:
+                pool.release(connection)
+        except Exception as e:
+            print("Error loading home location index:", e)
+            with self._lock:
+                self._pending = None
+                self._loaded_at = time.monotonic()
+            return
+        cells = {}
+        if len(home_ids):
+            self._insert(cells, home_ids, lats, lons)
+        with self._lock:
+            watermark = int(home_ids.max()) if len(home_ids) else 0
+            loaded = set(home_ids.tolist()) if self._pending else set()
+            pending = [entry for entry in self._pending if entry[0] not in loaded]
+            if pending:
+                self._insert(cells, *(np.array(column, dtype=dtype) for column, dtype in zip(zip(*pending), (np.int64, float, float))))
+            self._cells = cells
+            self._count = len(home_ids) + len(pending)
+            self._watermark = watermark
+            self._added_above_watermark = {entry[0] for entry in pending if entry[0] > watermark}
+            self._pending = None
+            self._epoch = epoch
+            self._loaded_at = self._refreshed_at = time.monotonic()
+            self.ready = True
+
+    def start_load(self):
+        with self._lock:
+            if self._pending is not None:
+                return
+            self._pending = []
+        threading.Thread(target=self.load, name='home-location-index', daemon=True).start()
+
+    def add(self, home_id, lat, lon):
+        """Index a home this worker just committed"""
+        self.add_many([home_id], [lat], [lon])
+
+    def add_many(self, home_ids, lats, lons):
+        """Index homes this worker just committed, copying the cells dict once for all of them"""
+        located = [(home_id, lat, lon) for home_id, lat, lon in zip(home_ids, lats, lons) if lat is not None and lon is not None]
+        if not located:
+            return
+        columns = [np.array(column, dtype=dtype) for column, dtype in zip(zip(*located), (np.int64, float, float))]
+        with self._lock:
+            if self._pending is not None:
+                self._pending.extend(located)
+            cells = dict(self._cells)
+            self._insert(cells, *columns)
+            self._cells = cells
+            self._count += len(located)
+            self._added_above_watermark.update(home_id for home_id, _, _ in located if home_id > self._watermark)
+
+    def remove(self, home_id, lat, lon):
+        """Drop a home this worker just deleted; other workers drop it at their next full reload"""
+        if lat is None or lon is None:
+            return
+        with self._lock:
+            key = int(self._cell_keys(np.array([lat]), np.array([lon]))[0])
+            entry = self._cells.get(key)
+            if entry is None:
+                return
+            keep = entry[0] != home_id
+            if keep.all():
+                return
+            cells = dict(self._cells)
+            if keep.any():
+                cells[key] = tuple(column[keep] for column in entry)
+            else:
+                del cells[key]
+            self._cells = cells
+            self._count -= int((~keep).sum())
+
+    def maintain(self):
+        """Reload after init_db or when stale, and pull homes other workers inserted since the watermark"""
+        now = time.monotonic()
+        if self._pending is None and (
+            self._epoch != get_versions().epoch() or now - self._loaded_at > LOCATION_INDEX_REBUILD
+        ):
+            self.start_load()
+            return
+        with self._lock:
+            if not self.ready or self._refreshing or now - self._refreshed_at < LOCATION_INDEX_REFRESH:
+                return
+            self._refreshing = True
+            watermark = self._watermark
+        try:
+            cursor = get_db_connection().cursor()
+            home_ids, lats, lons = self._fetch(cursor, watermark)
+            cursor.close()
+            with self._lock:
+                if len(home_ids):
+                    fresh = np.array([home_id not in self._added_above_watermark for home_id in home_ids.tolist()])
+                    if fresh.any():
+                        cells = dict(self._cells)
+                        self._insert(cells, home_ids[fresh], lats[fresh], lons[fresh])
+                        self._cells = cells
+                        self._count += int(fresh.sum())
+                    self._watermark = max(self._watermark, int(home_ids.max()))
+                    self._added_above_watermark = {i for i in self._added_above_watermark if i > self._watermark}
+                self._refreshed_at = time.monotonic()
+        finally:
+            self._refreshing = False
+
+    def nearest(self, lat, lon, k, max_distance=None):
+        """Return [(home_id, lat, lon, distance_m)] of the k closest homes, searching rings of cells outward"""
+        cells = self._cells
+        row = int((lat + 90) // self.cell)
+        column = int((lon + 180) // self.cell) % self.columns
+        found = []  # (home_ids, lats, lons, distances) per visited cell
+        count = 0
+        ring = 0
+        while True:
+            if (2 * ring + 1) ** 2 >= len(cells):
+                # The rings now cover more cells than exist: scan what is left in one pass
+                keys = cells.keys() if ring == 0 else [key for key in cells if self._ring_of(key, row, column) >= ring]
+            else:
+                keys = self._ring_keys(row, column, ring)
+            for key in keys:
+                entry = cells.get(key)
+                if entry is not None:
+                    found.append(entry + (haversine_m(lat, lon, entry[1], entry[2]),))
+                    count += len(entry[0])
+            if (2 * ring + 1) ** 2 >= len(cells):
+                break
+            # No home in ring r + 1 is closer than r full cells; use the narrowest cell width those rings reach
+            reach = min(abs(lat) + (ring + 2) * self.cell, 90)
+            bound = ring * self.cell * METERS_PER_DEGREE * math.cos(math.radians(reach))
+            if count >= k and np.partition(np.concatenate([entry[3] for entry in found]), k - 1)[k - 1] <= bound:
+                break
+            if max_distance is not None and bound > max_distance:
+                break
+            ring += 1
+        if not found:
+            return []
+        home_ids, lats, lons, distances = (np.concatenate(column) for column in zip(*found))
+        if max_distance is not None:
+            within = distances <= max_distance
+            home_ids, lats, lons, distances = home_ids[within], lats[within], lons[within], distances[within]
+        if len(distances) > k:
+            closest = np.argpartition(distances, k - 1)[:k]
+            home_ids, lats, lons, distances = home_ids[closest], lats[closest], lons[closest], distances[closest]
+        order = np.argsort(distances)
+        return list(zip(home_ids[order].tolist(), lats[order].tolist(), lons[order].tolist(), distances[order].tolist()))
+
+    def _ring_keys(self, row, column, ring):
+        if ring == 0:
+            return [row * self.columns + column]
+        keys = []
+        for r in range(row - ring, row + ring + 1):
+            step = 1 if r in (row - ring, row + ring) else 2 * ring
+            for c in range(column - ring, column + ring + 1, step):
+                keys.append(r * self.columns + c % self.columns)
+        return keys
+
+    def _ring_of(self, key, row, column):
+        r, c = divmod(key, self.columns)
+        dc = abs(c - column)
+        return max(abs(r - row), min(dc, self.columns - dc))
+
+    def stats(self):
+        with self._lock:
+            return {"ready": self.ready, "homes": self._count, "cells": len(self._cells), "watermark": self._watermark}
+
+_location_index = None
+_location_index_lock = threading.Lock()
+
+def get_location_index():
+    """Return this process's location index, starting its initial load in the background on first use"""
+    global _location_index
+    if _location_index is None or _location_index.pid != os.getpid():
+        with _location_index_lock:
+            if _location_index is None or _location_index.pid != os.getpid():
+                _location_index = HomeLocationIndex(LOCATION_INDEX_CELL_DEGREES)
+                _location_index.start_load()
+    return _location_index
+
+@app.before_request
+def warm_location_index():
+    # Build the index as soon as a worker serves its first request rather than on the first nearest query
+    if _location_index is None or _location_index.pid != os.getpid():
+        get_location_index()
+
+@app.route('/homes/nearest', methods=['GET'])
+def get_nearest_homes():
+    if request.headers.get('X-API-KEY') != API_KEY:
+        return jsonify({"error": "Unauthorized"}), 401
+    lat = get_float_arg('lat', -90, 90)
+    lon = get_float_arg('lon', -180, 180)
+    max_distance = None
+    if 'max_distance' in request.args:
+        max_distance = get_float_arg('max_distance', 0, math.pi * EARTH_RADIUS_M)
+    try:
+        k = int(request.args.get('k', NEAREST_DEFAULT_K))
+    except ValueError:
+        raise InvalidRequestError("k must be an integer.")
+    if not 1 <= k <= NEAREST_MAX_K:
+        raise InvalidRequestError("k must be between 1 and %d." % NEAREST_MAX_K)
+    index = get_location_index()
+    index.maintain()
+    if not index.ready:
+        return jsonify({"error": "Location index is loading."}), 503, {"Retry-After": "5"}
+    return render([
+        {"home_id": home_id, "latitude": home_lat, "longitude": home_lon, "distance_m": round(distance, 2)}
+        for home_id, home_lat, home_lon, distance in index.nearest(lat, lon, k, max_distance)
+    ])
 
 @app.route('/homes/<homeowner_id>', methods=['GET'])
 def get_homes_by_homeowner(homeowner_id):
     if request.headers.get('X-API-KEY') != API_KEY:
         return jsonify({"error": "Unauthorized"}), 401
+    layout = get_layout()
+    conditions, params, keys, descending = get_home_query()
+    fields = get_fields(HOME_COLUMNS, required=keys)
+    limit, after = get_home_page_args(keys, descending)
+
+    def build():
+        connection = get_db_connection()
+        cursor = layout_cursor(connection, layout)
+        cursor.execute(*home_select(
+            fields, ['homeowner_id = %s'] + conditions, [homeowner_id] + params, keys, descending, after, limit + 1
+        ))
+        homes = cursor.fetchall()
+        columns = layout_columns(cursor, layout)
+        cursor.close()
+        return paginated_response(home_page_scope(keys, descending), homes, limit, keys if len(keys) > 1 else keys[0], columns)
+
+    return cached_homeowner_response(homeowner_id, build)
+
+# Delta sync: changes younger than this are held back, so a write whose transaction commits after
+# a later-stamped one is never skipped by a watermark that already moved past it
+CHANGES_SETTLE_SECONDS = int(os.getenv('CHANGES_SETTLE_SECONDS', 2))
+
+@app.route('/homes/<homeowner_id>/changes', methods=['GET'])
+def get_home_changes(homeowner_id):
+    """Homes written and deleted since ?since=<watermark>, oldest first, with the watermark to send next time
+
+    Without since, every live home is returned (a full sync) and tombstones are skipped.
+    """
+    if request.headers.get('X-API-KEY') != API_KEY:
+        return jsonify({"error": "Unauthorized"}), 401
+    fields = get_fields(HOME_COLUMNS, required=('home_id', 'updated_at'))
+    limit = get_limit_arg()
+    token = request.args.get('since')
+    since = None
+    if token:
+        try:
+            since = decode_cursor('changes', token, list)
+            since = [datetime.fromisoformat(since[0]), int(since[1])]
+        except (InvalidRequestError, ValueError, TypeError, IndexError):
+            raise InvalidRequestError("Invalid watermark.")
+
     connection = get_db_connection()
     cursor = connection.cursor(dictionary=True)
-    cursor.execute("SELECT * FROM Home WHERE homeowner_id = %s", (homeowner_id,))
-    homes = cursor.fetchall()
+    # Both sides are keyset scans of (homeowner_id, time) indexes; each fetches one row past the page
+    after = "AND (%s, home_id) > (%%s, %%s)" if since is not None else ""
+    params = [homeowner_id] + (since or []) + [CHANGES_SETTLE_SECONDS, limit + 1]
+    cursor.execute(
+        "SELECT %s FROM Home WHERE homeowner_id = %%s %s AND updated_at <= NOW(6) - INTERVAL %%s SECOND "
+        "ORDER BY updated_at, home_id LIMIT %%s" % (fields, after % 'updated_at' if after else ''),
+        params
+    )
+    changes = [(home['updated_at'], home['home_id'], home) for home in cursor.fetchall()]
+    if since is not None:
+        cursor.execute(
+            "SELECT home_id, deleted_at FROM HomeTombstone WHERE homeowner_id = %%s %s AND deleted_at <= NOW(6) - INTERVAL %%s SECOND "
+            "ORDER BY deleted_at, home_id LIMIT %%s" % (after % 'deleted_at'),
+            params
+        )
+        changes.extend((tombstone['deleted_at'], tombstone['home_id'], None) for tombstone in cursor.fetchall())
     cursor.close()
-    connection.close()
-    return jsonify(homes)
+
+    changes.sort(key=lambda change: change[:2])
+    has_more = len(changes) > limit
+    changes = changes[:limit]
+    if changes:
+        watermark = encode_cursor('changes', [changes[-1][0].isoformat(), changes[-1][1]])
+    else:
+        watermark = token
+    return render({
+        "homes": [home for _, _, home in changes if home is not None],
+        "deleted": [home_id for _, home_id, home in changes if home is None],
+        "watermark": watermark,
+        "has_more": has_more
+    })
+
+# Change feed: each open stream polls the HomeChange outbox, holding a pool connection only while it reads.
+# A stream occupies one thread of a gthread worker (see nixpacks.toml), so subscribers never block the rest of
+# the API. Streams end after CHANGE_FEED_MAX_SECONDS, inside gunicorn's worker timeout should the app run
+# under sync workers; EventSource clients reconnect on their own and resume from the Last-Event-ID they were sent.
+CHANGE_FEED_POLL_SECONDS = float(os.getenv('CHANGE_FEED_POLL_SECONDS', 1))
+CHANGE_FEED_BATCH_SIZE = int(os.getenv('CHANGE_FEED_BATCH_SIZE', 500))
+CHANGE_FEED_MAX_SECONDS = float(os.getenv('CHANGE_FEED_MAX_SECONDS', 25))
+CHANGE_FEED_RETRY_MS = int(os.getenv('CHANGE_FEED_RETRY_MS', 1000))
+
+def change_events(after):
+    """Yield SSE events for HomeChange entries after change_id after (None: from the current end of the log)"""
+    pool = get_pool()
+    deadline = time.monotonic() + CHANGE_FEED_MAX_SECONDS
+    yield 'retry: %d\n\n' % CHANGE_FEED_RETRY_MS
+    while True:
+        connection = pool.acquire()
+        try:
+            cursor = connection.cursor(dictionary=True)
+            if after is None:
+                cursor.execute("SELECT COALESCE(MAX(change_id), 0) AS change_id FROM HomeChange")
+                after = cursor.fetchone()['change_id']
+            # Entries are held back until they settle, as in delta sync, so a late commit is not skipped
+            cursor.execute(
+                "SELECT change_id, home_id, homeowner_id, operation, changed_at FROM HomeChange "
+                "WHERE change_id > %s AND changed_at <= NOW(6) - INTERVAL %s SECOND ORDER BY change_id LIMIT %s",
+                (after, CHANGES_SETTLE_SECONDS, CHANGE_FEED_BATCH_SIZE)
+            )
+            changes = cursor.fetchall()
+            cursor.close()
+        finally:
+            pool.release(connection)
+        for change in changes:
+            yield 'id: %d\nevent: %s\ndata: %s\n\n' % (
+                change['change_id'], change['operation'], app.json.dumps(change, separators=(',', ':'))
+            )
+        if changes:
+            after = changes[-1]['change_id']
+        if time.monotonic() >= deadline:
+            return
+        if len(changes) < CHANGE_FEED_BATCH_SIZE:
+            time.sleep(CHANGE_FEED_POLL_SECONDS)
+
+@app.route('/changes/stream', methods=['GET'])
+def stream_changes():
+    """Server-Sent Events feed of Home writes; resumes after Last-Event-ID (or ?after=), else starts at the end"""
+    if request.headers.get('X-API-KEY') != API_KEY:
+        return jsonify({"error": "Unauthorized"}), 401
+    after = request.headers.get('Last-Event-ID') or request.args.get('after')
+    if after is not None:
+        try:
+            after = int(after)
+        except ValueError:
+            raise InvalidRequestError("Last-Event-ID must be a change_id.")
+        if after < 0:
+            raise InvalidRequestError("Last-Event-ID must be a change_id.")
+    response = Response(change_events(after), mimetype='text/event-stream')
+    response.headers['Cache-Control'] = 'no-cache'
+    response.headers['X-Accel-Buffering'] = 'no'
+    return response
+
+# Columns written by add_home and the batch endpoint, in parse_home_payload order
+HOME_INSERT_COLUMNS = (
+    'homeowner_id', 'home_name', 'house_age', 'house_use', 'renovations', 'type_of_house', 'num_floor', 'lot_area', 'floor_area',
+    'selected_house_type', 'selected_material', 'selected_flooring', 'selected_wall', 'selected_ceiling', 'latitude', 'longitude', 'is_default'
+)
+INSERT_HOME_SQL = "INSERT INTO Home (%s) VALUES " % ', '.join(HOME_INSERT_COLUMNS)
+HOME_VALUES_SQL = "(%s)" % ', '.join(['%s'] * len(HOME_INSERT_COLUMNS))
+
+# Batch inserts: items per request and rows per multi-row INSERT (one transaction each)
+HOME_BATCH_MAX_ITEMS = int(os.getenv('HOME_BATCH_MAX_ITEMS', 10000))
+HOME_BATCH_CHUNK_SIZE = int(os.getenv('HOME_BATCH_CHUNK_SIZE', 500))
+
+def text_field(name, value, max_length, required=False):
+    """A string field of a home payload, checked against its column: NOT NULL and VARCHAR/TEXT length"""
+    if value is None:
+        if required:
+            raise ValueError("%s is required." % name)
+        return None
+    if not isinstance(value, str):
+        raise TypeError("%s must be a string." % name)
+    if len(value) > max_length:
+        raise ValueError("%s must be at most %d characters." % (name, max_length))
+    return value
+
+def int_field(name, value):
+    value = int(value) if value is not None else None
+    if value is not None and not -2 ** 31 <= value < 2 ** 31:
+        raise ValueError("%s is out of range." % name)
+    return value
+
+def float_field(name, value):
+    value = float(value) if value is not None else None
+    if value is not None and not math.isfinite(value):
+        raise ValueError("%s must be a finite number." % name)
+    return value
+
+def parse_home_payload(data):
+    """Map an add_home JSON payload onto a row in HOME_INSERT_COLUMNS order
+
+    Checks types and the column constraints (NOT NULL, lengths, INT range), so a bad item fails on its
+    own instead of at INSERT time. Raises KeyError for missing fields and ValueError/TypeError for
+    unconvertible or out-of-bounds values.
+    """
+    homeowner_id = text_field('homeowner_id', data['homeowner_id'], 50, required=True)
+    if not homeowner_id:
+        raise ValueError("homeowner_id must not be empty.")
+    home_name = text_field('homeName', data['homeName'], 100, required=True)
+    house_age = int_field('houseAge', data['houseAge'])
+    house_use = text_field('houseUse', data['houseUse'], 100)
+    renovations = text_field('renovations', data.get('renovations'), 65535)
+    if renovations is not None and len(renovations.encode()) > 65535:
+        raise ValueError("renovations must be at most 65535 bytes.")
+    type_of_house = text_field('typeOfHouse', data['typeOfHouse'], 100)
+    num_floor = int_field('numFloor', data['numFloor'])
+    lot_area = float_field('lotArea', data['lotArea'])
+    floor_area = float_field('floorArea', data['floorArea'])
+    selected_house_type = text_field('selectedHouseType', data['selectedHouseType'], 100)
+    selected_material = text_field('selectedMaterial', data['selectedMaterial'], 100)
+    selected_flooring = text_field('selectedFlooring', data['selectedFlooring'], 100)
+    selected_wall = text_field('selectedWall', data['selectedWall'], 100)
+    selected_ceiling = text_field('selectedCeiling', data['selectedCeiling'], 100)
+    latitude = float_field('latitude', data.get('latitude'))
+    longitude = float_field('longitude', data.get('longitude'))
+    is_default = data.get('is_default', False)
+    if not isinstance(is_default, (bool, int)) or is_default not in (0, 1):
+        raise ValueError("is_default must be a boolean.")
+    return (
+        homeowner_id, home_name, house_age, house_use, renovations, type_of_house, num_floor, lot_area, floor_area,
+        selected_house_type, selected_material, selected_flooring, selected_wall, selected_ceiling, latitude, longitude, bool(is_default)
+    )
 
 @app.route('/homes', methods=['POST'])
 def add_home():
     if request.headers.get('X-API-KEY') != API_KEY:
         return jsonify({"error": "Unauthorized"}), 401
     try:
-        data = request.json
-        homeowner_id = data['homeowner_id']
-        home_name = data['homeName']
-        house_age = int(data['houseAge']) if data['houseAge'] is not None else None
-        house_use = data['houseUse']
-        renovations = data.get('renovations', None)
-        type_of_house = data['typeOfHouse']
-        num_floor = int(data['numFloor']) if data['numFloor'] is not None else None
-        lot_area = float(data['lotArea']) if data['lotArea'] is not None else None
-        floor_area = float(data['floorArea']) if data['floorArea'] is not None else None
-        selected_house_type = data['selectedHouseType']
-        selected_material = data['selectedMaterial']
-        selected_flooring = data['selectedFlooring']
-        selected_wall = data['selectedWall']
-        selected_ceiling = data['selectedCeiling']
-        latitude = float(data.get('latitude', 0)) if data.get('latitude') is not None else None
-        longitude = float(data.get('longitude', 0)) if data.get('longitude') is not None else None
-        is_default = data.get('is_default', False)
+        home = parse_home_payload(get_request_payload())
+        homeowner_id = home[0]
+        is_default = home[-1]
 
         connection = get_db_connection()
         cursor = connection.cursor()
 
-        # Set all existing homes of the homeowner to non-default if the new home is default
+        # Lock the homeowner row so concurrent default changes queue up, and learn which home to demote
         if is_default:
-            cursor.execute("UPDATE Home SET is_default = FALSE WHERE homeowner_id = %s", (homeowner_id,))
+            cursor.execute("SELECT default_home_id FROM Homeowner WHERE homeowner_id = %s FOR UPDATE", (homeowner_id,))
+            owner = cursor.fetchone()
 
-        cursor.execute("""
-            INSERT INTO Home (
-                homeowner_id, home_name, house_age, house_use, renovations, type_of_house, num_floor, lot_area, floor_area,
-                selected_house_type, selected_material, selected_flooring, selected_wall, selected_ceiling, latitude, longitude, is_default
-            ) VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s)
-        """, (
-            homeowner_id, home_name, house_age, house_use, renovations, type_of_house, num_floor, lot_area, floor_area,
-            selected_house_type, selected_material, selected_flooring, selected_wall, selected_ceiling, latitude, longitude, is_default
-        ))
+        cursor.execute(INSERT_HOME_SQL + HOME_VALUES_SQL, home)
+
+        home_id = cursor.lastrowid
+        record_changes(cursor, [(home_id, homeowner_id, 'insert')])
+        if is_default and owner is not None:
+            set_default_home(cursor, homeowner_id, home_id, owner[0])
 
         connection.commit()
         cursor.close()
-        connection.close()
+        homeowner_changed(homeowner_id)
+        tables_changed('Home', 'HomeChange', 'Homeowner')
+        get_location_index().add(home_id, home[14], home[15])
 
         return jsonify({"message": "Home added successfully"})
+    except (PoolExhaustedError, QueryCancelledError):
+        raise
     except Exception as e:
         return jsonify({"error": str(e)}), 400
 
-@app.route('/homeowners/<homeowner_id>/default_home', methods=['GET'])
-def get_default_home(homeowner_id):
+@app.route('/homes/<int:home_id>', methods=['DELETE'])
+def delete_home(home_id):
     if request.headers.get('X-API-KEY') != API_KEY:
         return jsonify({"error": "Unauthorized"}), 401
     connection = get_db_connection()
-    cursor = connection.cursor(dictionary=True)
-    cursor.execute("SELECT home_name, latitude, longitude FROM Home WHERE homeowner_id = %s AND is_default = TRUE", (homeowner_id,))
-    default_home = cursor.fetchone()
+    cursor = connection.cursor()
+    cursor.execute("SELECT homeowner_id FROM Home WHERE home_id = %s", (home_id,))
+    home = cursor.fetchone()
+    if home is None:
+        cursor.close()
+        return jsonify({"error": "Home not found"}), 404
+    homeowner_id = home[0]
+
+    # Lock the homeowner before the home, in the order add_home takes them
+    cursor.execute("SELECT default_home_id FROM Homeowner WHERE homeowner_id = %s FOR UPDATE", (homeowner_id,))
+    cursor.fetchone()
+    cursor.execute("SELECT latitude, longitude FROM Home WHERE home_id = %s FOR UPDATE", (home_id,))
+    home = cursor.fetchone()
+    if home is None:
+        connection.rollback()
+        cursor.close()
+        return jsonify({"error": "Home not found"}), 404
+    cursor.execute("REPLACE INTO HomeTombstone (home_id, homeowner_id) VALUES (%s, %s)", (home_id, homeowner_id))
+    cursor.execute("DELETE FROM Home WHERE home_id = %s", (home_id,))
+    record_changes(cursor, [(home_id, homeowner_id, 'delete')])
+    cursor.execute(
+        "UPDATE Homeowner SET default_home_id = NULL WHERE homeowner_id = %s AND default_home_id = %s", (homeowner_id, home_id)
+    )
+    connection.commit()
     cursor.close()
-    connection.close()
-    if default_home:
-        return jsonify(default_home)
+    homeowner_changed(homeowner_id)
+    tables_changed('Home', 'HomeTombstone', 'HomeChange', 'Homeowner')
+    get_location_index().remove(home_id, *home)
+    return jsonify({"message": "Home deleted successfully"})
+
+def set_default_home(cursor, homeowner_id, home_id, previous_home_id):
+    """Point Homeowner.default_home_id at home_id and demote the previous default: two primary key writes
+
+    Call inside the caller's transaction after locking the homeowner row with SELECT ... FOR UPDATE.
+    """
+    if previous_home_id is not None and previous_home_id != home_id:
+        cursor.execute("UPDATE Home SET is_default = FALSE WHERE home_id = %s", (previous_home_id,))
+        record_changes(cursor, [(previous_home_id, homeowner_id, 'update')])
+    cursor.execute("UPDATE Homeowner SET default_home_id = %s WHERE homeowner_id = %s", (home_id, homeowner_id))
+
+def record_changes(cursor, changes):
+    """Append (home_id, homeowner_id, operation) entries to the HomeChange outbox
+
+    Call inside the transaction making the change, so the feed has an entry exactly when the write committed.
+    """
+    if changes:
+        cursor.execute(
+            "INSERT INTO HomeChange (home_id, homeowner_id, operation) VALUES %s" % ', '.join(['(%s, %s, %s)'] * len(changes)),
+            [value for change in changes for value in change]
+        )
+
+def insert_home_chunk(connection, rows):
+    """Insert rows with one multi-row INSERT in a single transaction and return their home_ids
+
+    Only the last default row per homeowner in the chunk stays default, exactly as if the rows
+    had been posted to add_home one by one.
+    """
+    last_default = {}
+    for i, row in enumerate(rows):
+        if row[-1]:
+            last_default[row[0]] = i
+    rows = [row[:-1] + (bool(row[-1]) and last_default[row[0]] == i,) for i, row in enumerate(rows)]
+
+    cursor = connection.cursor()
+    try:
+        owners = list(last_default)
+        owner_placeholders = ', '.join(['%s'] * len(owners))
+        previous = {}
+        if owners:
+            cursor.execute(
+                "SELECT homeowner_id, default_home_id FROM Homeowner WHERE homeowner_id IN (%s) FOR UPDATE" % owner_placeholders,
+                owners
+            )
+            previous = dict(cursor.fetchall())
+        cursor.execute(INSERT_HOME_SQL + ', '.join([HOME_VALUES_SQL] * len(rows)), [value for row in rows for value in row])
+        # A multi-row simple INSERT reserves one consecutive auto-increment block; LAST_INSERT_ID() is its first value
+        first_id = cursor.lastrowid
+        cursor.execute("SELECT @@auto_increment_increment")
+        step = cursor.fetchone()[0]
+        home_ids = [first_id + i * step for i in range(len(rows))]
+        changes = [(home_id, row[0], 'insert') for home_id, row in zip(home_ids, rows)]
+        if owners:
+            demoted = [home_id for home_id in previous.values() if home_id is not None]
+            if demoted:
+                cursor.execute(
+                    "UPDATE Home SET is_default = FALSE WHERE home_id IN (%s)" % ', '.join(['%s'] * len(demoted)), demoted
+                )
+                changes.extend((home_id, owner, 'update') for owner, home_id in previous.items() if home_id is not None)
+            cases = []
+            for owner in owners:
+                cases.extend((owner, home_ids[last_default[owner]]))
+            cursor.execute(
+                "UPDATE Homeowner SET default_home_id = CASE homeowner_id %s END WHERE homeowner_id IN (%s)"
+                % (' '.join(['WHEN %s THEN %s'] * len(owners)), owner_placeholders),
+                cases + owners
+            )
+        record_changes(cursor, changes)
+        connection.commit()
+    except Exception:
+        connection.rollback()
+        raise
+    finally:
+        cursor.close()
+    return home_ids
+
+@app.route('/homes/batch', methods=['POST'])
+def add_homes_batch():
+    if request.headers.get('X-API-KEY') != API_KEY:
+        return jsonify({"error": "Unauthorized"}), 401
+    data = get_request_payload()
+    items = data.get('homes') if isinstance(data, dict) else data
+    if not isinstance(items, list) or not items:
+        return jsonify({"error": "Expected a non-empty JSON array of homes."}), 400
+    if len(items) > HOME_BATCH_MAX_ITEMS:
+        return jsonify({"error": "At most %d homes per batch." % HOME_BATCH_MAX_ITEMS}), 400
+
+    # Validate everything before writing anything
+    rows = []
+    errors = {}
+    for index, item in enumerate(items):
+        if not isinstance(item, dict):
+            rows.append(None)
+            errors[index] = "Expected a JSON object."
+            continue
+        try:
+            rows.append(parse_home_payload(item))
+        except KeyError as e:
+            rows.append(None)
+            errors[index] = "Missing field %s" % e
+        except (ValueError, TypeError, AttributeError) as e:
+            rows.append(None)
+            errors[index] = str(e)
+    owners = list({row[0] for row in rows if row is not None})
+    connection = get_db_connection()
+    if owners:
+        cursor = connection.cursor()
+        cursor.execute(
+            "SELECT homeowner_id FROM Homeowner WHERE homeowner_id IN (%s)" % ', '.join(['%s'] * len(owners)), owners
+        )
+        known = {homeowner_id for (homeowner_id,) in cursor.fetchall()}
+        cursor.close()
+        for index, row in enumerate(rows):
+            if row is not None and row[0] not in known:
+                errors[index] = "Unknown homeowner_id %s" % row[0]
+    if errors:
+        errors = [{"index": index, "error": error} for index, error in sorted(errors.items())]
+        return jsonify({"error": "Validation failed; nothing was written.", "items": errors}), 400
+
+    results = []
+    for start in range(0, len(rows), HOME_BATCH_CHUNK_SIZE):
+        chunk = rows[start:start + HOME_BATCH_CHUNK_SIZE]
+        try:
+            home_ids = insert_home_chunk(connection, chunk)
+        except (PoolExhaustedError, QueryCancelledError):
+            raise
+        except Exception as e:
+            results.extend({"index": start + i, "status": "error", "error": str(e)} for i in range(len(chunk)))
+            continue
+        for homeowner_id in {row[0] for row in chunk}:
+            homeowner_changed(homeowner_id)
+        tables_changed('Home', 'HomeChange', 'Homeowner')
+        get_location_index().add_many(home_ids, [row[14] for row in chunk], [row[15] for row in chunk])
+        results.extend(
+            {"index": start + i, "status": "created", "home_id": home_id} for i, home_id in enumerate(home_ids)
+        )
+
+    created = sum(1 for result in results if result["status"] == "created")
+    return render({"created": created, "failed": len(results) - created, "items": results})
+
+@app.route('/homeowners/<homeowner_id>/default_home', methods=['GET'])
+def get_default_home(homeowner_id):
+    if request.headers.get('X-API-KEY') != API_KEY:
+        return jsonify({"error": "Unauthorized"}), 401
+
+    def build():
+        connection = get_db_connection()
+        cursor = connection.cursor(dictionary=True)
+        cursor.execute("""
+            SELECT h.home_name, h.latitude, h.longitude
+            FROM Homeowner o JOIN Home h ON h.home_id = o.default_home_id
+            WHERE o.homeowner_id = %s
+        """, (homeowner_id,))
+        default_home = cursor.fetchone()
+        cursor.close()
+        if default_home:
+            return render(default_home)
+        else:
+            return render({'message': 'No default home found'}, 404)
+
+    return cached_homeowner_response(homeowner_id, build)
+
+# Ad-hoc query guard: /sqlQuery runs one SELECT with a LIMIT, a server-side time limit and a result budget
+SQL_QUERY_MAX_ROWS = int(os.getenv('SQL_QUERY_MAX_ROWS', 10000))
+SQL_QUERY_MAX_BYTES = int(os.getenv('SQL_QUERY_MAX_BYTES', 16 * 1024 * 1024))  # Estimated from the values fetched
+SQL_QUERY_TIMEOUT_MS = int(os.getenv('SQL_QUERY_TIMEOUT_MS', 10000))  # MAX_EXECUTION_TIME hint
+
+SQL_TOKEN = re.compile(r"""
+    (?P<space>\s+)
+    |(?P<comment>/\*(?![!]).*?\*/|--(?:\s[^\n]*)?(?:\n|$)|\#[^\n]*(?:\n|$))
+    |(?P<string>'(?:[^'\\]|\\.|'')*'|"(?:[^"\\]|\\.|"")*")
+    |(?P<identifier>`(?:[^`]|``)*`)
+    |(?P<word>[A-Za-z_$][\w$]*)
+    |(?P<number>\d+(?:\.\d*)?(?:[eE][-+]?\d+)?)
+    |(?P<open>\()
+    |(?P<close>\))
+    |(?P<semicolon>;)
+    |(?P<unsafe>['"`]|/\*)
+    |(?P<other>.)
+""", re.S | re.X)
+
+def sql_tokens(sql):
+    """Split a statement into (kind, text, start, end, depth) tokens, depth counting open parentheses"""
+    tokens = []
+    depth = 0
+    for match in SQL_TOKEN.finditer(sql):
+        kind = match.lastgroup
+        if kind == 'unsafe':
+            raise InvalidRequestError("Unterminated string, identifier or comment, or an executable comment.")
+        if kind == 'close':
+            depth -= 1
+        tokens.append((kind, match.group(), match.start(), match.end(), depth))
+        if kind == 'open':
+            depth += 1
+    return tokens
+
+def guard_select(sql, max_rows, timeout_ms):
+    """Rewrite one SELECT so it returns at most max_rows + 1 rows and is cut off after timeout_ms
+
+    A client LIMIT above max_rows is lowered to max_rows + 1, so reading that extra row means
+    the result was truncated.
+    """
+    tokens = [token for token in sql_tokens(sql) if token[0] != 'space']
+    code = [token for token in tokens if token[0] != 'comment']
+    if code and code[-1][0] == 'semicolon':
+        sql = sql[:code[-1][2]]
+        code.pop()
+        tokens = [token for token in tokens if token[2] < len(sql)]
+    if any(token[0] == 'semicolon' for token in code):
+        raise InvalidRequestError("Only one statement is allowed.")
+    if not code or code[0][0] != 'word' or code[0][1].upper() != 'SELECT':
+        raise InvalidRequestError("Only SELECT queries are allowed.")
+
+    limit_at = None
+    for i, (kind, text, start, end, depth) in enumerate(code):
+        if kind != 'word':
+            continue
+        word = text.upper()
+        following = code[i + 1][1].upper() if i + 1 < len(code) else ''
+        # At any depth: subqueries and derived tables take locking clauses too, held until the connection is released
+        if word == 'INTO' or (word == 'FOR' and following in ('UPDATE', 'SHARE')) or (word == 'LOCK' and following == 'IN'):
+            raise InvalidRequestError("SELECT ... INTO and locking reads are not allowed.")
+        if word == 'LIMIT' and depth == 0:
+            limit_at = i
+
+    if limit_at is None:
+        # Right after the last token of code, so a trailing -- comment cannot swallow it
+        end = code[-1][3]
+        sql = "%s LIMIT %d%s" % (sql[:end], max_rows + 1, sql[end:])
+    else:
+        # LIMIT count | LIMIT offset, count | LIMIT count OFFSET offset
+        clause = code[limit_at + 1:]
+        texts = [token[1].upper() for token in clause]
+        if len(clause) == 1 and clause[0][0] == 'number':
+            count, offset = clause[0], ''
+        elif len(clause) == 3 and texts[1] == ',' and clause[0][0] == clause[2][0] == 'number':
+            count, offset = clause[2], clause[0][1] + ', '
+        elif len(clause) == 3 and texts[1] == 'OFFSET' and clause[0][0] == clause[2][0] == 'number':
+            count, offset = clause[0], ''
+        else:
+            raise InvalidRequestError("LIMIT must end the statement and take literal numbers.")
+        if int(count[1]) > max_rows:
+            tail = " OFFSET %s" % clause[2][1] if texts[1:2] == ['OFFSET'] else ''
+            sql = "%sLIMIT %s%d%s" % (sql[:code[limit_at][2]], offset, max_rows + 1, tail)
+
+    # Optimizer hints must directly follow SELECT; merge into the client's own hint comment if there is one
+    select_end = code[0][3]
+    after_select = tokens[1] if len(tokens) > 1 else None
+    hint = "MAX_EXECUTION_TIME(%d)" % timeout_ms
+    if after_select is not None and after_select[0] == 'comment' and after_select[1].startswith('/*+'):
+        sql = "%s/*+ %s %s" % (sql[:after_select[2]], hint, sql[after_select[2] + 3:].lstrip())
     else:
-        return jsonify({'message': 'No default home found'}), 404
+        sql = "%s /*+ %s */%s" % (sql[:select_end], hint, sql[select_end:])
+    return sql
+
+def estimate_size(values):
+    return sum(len(value) if isinstance(value, (str, bytes, bytearray)) else 8 for value in values)
+
+# Admission control: /sqlQuery statements are EXPLAINed first. Plans over the cost or rows-examined ceiling are
+# rejected; plans with a large full scan or a filesort, or above SQL_QUERY_QUEUE_COST, wait for one of
+# SQL_QUERY_HEAVY_SLOTS (shared by every worker through MySQL user locks) so they never run side by side.
+SQL_QUERY_MAX_COST = float(os.getenv('SQL_QUERY_MAX_COST', 200000))
+SQL_QUERY_MAX_ROWS_EXAMINED = int(os.getenv('SQL_QUERY_MAX_ROWS_EXAMINED', 2000000))
+SQL_QUERY_QUEUE_COST = float(os.getenv('SQL_QUERY_QUEUE_COST', 20000))
+SQL_QUERY_FULL_SCAN_ROWS = int(os.getenv('SQL_QUERY_FULL_SCAN_ROWS', 10000))  # Full scans of smaller tables are fine
+SQL_QUERY_HEAVY_SLOTS = int(os.getenv('SQL_QUERY_HEAVY_SLOTS', 1))
+SQL_QUERY_QUEUE_TIMEOUT = float(os.getenv('SQL_QUERY_QUEUE_TIMEOUT', 10))
+
+@contextlib.contextmanager
+def heavy_query_slot(timeout):
+    """Hold one of the heavy query slots for the block, yielding False if none frees up within timeout seconds
+
+    A slot is a GET_LOCK taken on a side connection of its own: the lock is server-wide, so every
+    worker sees it, and closing the session frees it even when the pooled connection running the
+    query is left in a state where RELEASE_LOCK would fail, or this process dies.
+    """
+    names = ['sqlquery_heavy_%s_%d' % (db_config['database'], n) for n in range(SQL_QUERY_HEAVY_SLOTS)]
+    side = mysql.connector.connect(connection_timeout=5, **db_config)
+    try:
+        cursor = side.cursor()
+        held = False
+        for name in names:
+            cursor.execute("SELECT GET_LOCK(%s, 0)", (name,))
+            held = cursor.fetchone()[0] == 1
+            if held:
+                break
+        if not held:
+            # All taken: queue on one of them, spread over the slots by process
+            cursor.execute("SELECT GET_LOCK(%s, %s)", (names[os.getpid() % len(names)], timeout))
+            held = cursor.fetchone()[0] == 1
+        cursor.close()
+        yield held
+    finally:
+        side.close()
+
+def plan_tables(node, found):
+    """Collect the "table" entries of one EXPLAIN FORMAT=JSON query block, in join order, and note filesorts
+
+    Query blocks nested in it (derived tables, subqueries, UNION branches) are not joined with its
+    tables; they go to found['blocks'] to be estimated on their own.
+    """
+    if isinstance(node, dict):
+        if node.get('using_filesort'):
+            found['filesort'] = True
+        if node.get('using_temporary_table'):
+            found['temporary'] = True
+        for key, value in node.items():
+            if key == 'query_block':
+                found['blocks'].append(value)
+                continue
+            if key == 'table' and isinstance(value, dict):
+                found['tables'].append(value)
+            plan_tables(value, found)
+    elif isinstance(node, list):
+        for item in node:
+            plan_tables(item, found)
+    return found
+
+def estimate_block(block, summary):
+    """Add one query block's estimated rows examined, and its nested blocks', to summary; return its cost"""
+    found = plan_tables(block, {'tables': [], 'blocks': [], 'filesort': False, 'temporary': False})
+    summary['filesort'] = summary['filesort'] or found['filesort']
+    summary['temporary'] = summary['temporary'] or found['temporary']
+    # Nested loop estimate: each table is scanned once per row the tables before it produce
+    prefix = 1
+    for table in found['tables']:
+        per_scan = table.get('rows_examined_per_scan', 0)
+        summary['rows_examined'] += prefix * per_scan
+        prefix = max(table.get('rows_produced_per_join', 1), 1)
+        summary['tables'].append({
+            "table": table.get('table_name'),
+            "access_type": table.get('access_type'),
+            "key": table.get('key'),
+            "rows_examined_per_scan": per_scan
+        })
+    nested_cost = sum(estimate_block(nested, summary) for nested in found['blocks'])
+    # A UNION's outer block has no cost of its own (it sits on its query_specifications)
+    cost = block.get('cost_info', {}).get('query_cost')
+    return float(cost) if cost is not None else nested_cost
+
+def explain_select(connection, query):
+    """Summarize the optimizer's plan for query: cost, estimated rows examined, large full scans, filesort"""
+    cursor = connection.cursor()
+    cursor.execute("EXPLAIN FORMAT=JSON " + query)
+    plan = json.loads(cursor.fetchone()[0])
+    cursor.close()
+    summary = {"rows_examined": 0, "filesort": False, "temporary": False, "tables": []}
+    cost = estimate_block(plan.get('query_block', {}), summary)
+    tables = summary["tables"]
+    return {
+        "cost": cost,
+        "rows_examined": int(summary["rows_examined"]),
+        "full_scans": [t["table"] for t in tables if t["access_type"] == 'ALL' and t["rows_examined_per_scan"] >= SQL_QUERY_FULL_SCAN_ROWS],
+        "filesort": summary["filesort"],
+        "temporary": summary["temporary"],
+        "tables": tables
+    }
+
+def admission(plan):
+    """'reject', 'queue' or 'run' for a plan summary from explain_select"""
+    if plan["cost"] > SQL_QUERY_MAX_COST or plan["rows_examined"] > SQL_QUERY_MAX_ROWS_EXAMINED:
+        return 'reject'
+    if plan["full_scans"] or plan["filesort"] or plan["cost"] > SQL_QUERY_QUEUE_COST:
+        return 'queue'
+    return 'run'
+
+def execute_select(connection, query, layout):
+    """Run a guarded SELECT and read at most SQL_QUERY_MAX_ROWS rows / SQL_QUERY_MAX_BYTES: (rows, columns, truncated)"""
+    cursor = layout_cursor(connection, layout, buffered=False)
+    cursor.execute(query)
+    columns = layout_columns(cursor, layout)
+    result = []
+    size = 0
+    truncated = False
+    while not truncated:
+        rows = cursor.fetchmany(STREAM_BATCH_SIZE)
+        if not rows:
+            break
+        for row in rows:
+            if len(result) == SQL_QUERY_MAX_ROWS or size > SQL_QUERY_MAX_BYTES:
+                truncated = True
+                break
+            result.append(row)
+            size += estimate_size(row.values() if layout == 'rows' else row)
+    if truncated:
+        # Read off what is left (at most the LIMIT) so the connection goes back to the pool clean
+        while cursor.fetchmany(STREAM_BATCH_SIZE):
+            pass
+    cursor.close()
+    return result, columns, truncated
+
+# Result cache: /sqlQuery responses keyed on the statement with whitespace and comments normalized away.
+# Entries remember the versions of the tables they read, so a write through the API from any worker makes
+# them stale; writes made outside the API are only picked up when the entry's TTL runs out.
+SQL_QUERY_CACHE_MAX_ENTRIES = int(os.getenv('SQL_QUERY_CACHE_MAX_ENTRIES', 1000))
+SQL_QUERY_CACHE_MAX_BYTES = int(os.getenv('SQL_QUERY_CACHE_MAX_BYTES', 64 * 1024 * 1024))
+SQL_QUERY_CACHE_TTL = float(os.getenv('SQL_QUERY_CACHE_TTL', 60))  # Seconds; 0 disables
+SQL_QUERY_CACHE_TABLES = {table.lower(): table for table in MANAGED_TABLES if table != 'schema_version'}
+# Results depending on more than table contents: time, randomness, the session, or tables outside the app's
+SQL_QUERY_UNCACHEABLE_WORDS = {
+    'now', 'sysdate', 'curdate', 'curtime', 'current_date', 'current_time', 'current_timestamp', 'localtime',
+    'localtimestamp', 'unix_timestamp', 'utc_date', 'utc_time', 'utc_timestamp', 'rand', 'uuid', 'uuid_short',
+    'connection_id', 'last_insert_id', 'found_rows', 'row_count', 'sleep', 'user', 'current_user', 'session_user',
+    'system_user', 'database', 'schema', 'information_schema', 'performance_schema', 'mysql', 'sys'
+}
+
+sql_query_cache = ResponseCache(SQL_QUERY_CACHE_MAX_ENTRIES, SQL_QUERY_CACHE_MAX_BYTES, SQL_QUERY_CACHE_TTL)
+
+def sql_cache_key(query):
+    """(normalized statement, tables read) for a guarded SELECT, or None when its result must not be cached"""
+    if SQL_QUERY_CACHE_TTL <= 0:
+        return None
+    words = []
+    tables = set()
+    for kind, text, start, end, depth in sql_tokens(query):
+        if kind in ('space', 'comment'):
+            continue
+        words.append(text)
+        if kind == 'other' and text == '@':
+            return None  # User and system variables
+        if kind in ('word', 'identifier'):
+            name = (text[1:-1].replace('``', '`') if kind == 'identifier' else text).lower()
+            if name in SQL_QUERY_UNCACHEABLE_WORDS:
+                return None
+            if name in SQL_QUERY_CACHE_TABLES:
+                tables.add(SQL_QUERY_CACHE_TABLES[name])
+    if not tables:
+        return None
+    return ' '.join(words), tuple(sorted(tables))
+
+def table_versions(tables):
+    versions = get_table_versions()
+    return tuple(versions.get(table.lower()) for table in tables)
 
 @app.route('/sqlQuery', methods=['POST'])
 def sql_query():
@@ -208,25 +2935,316 @@ def sql_query():
         return jsonify({"error": "Unauthorized"}), 401
 
     data = request.json
-    query = data.get("query", "").strip()
-
-    # Basic security check: Only allow SELECT statements
-    if not query.lower().startswith("select"):
-        return jsonify({"error": "Only SELECT queries are allowed."}), 400
+    query = guard_select(data.get("query", "").strip(), SQL_QUERY_MAX_ROWS, SQL_QUERY_TIMEOUT_MS)
+    layout = get_layout()
+    cache_key = sql_cache_key(query)
+    if cache_key is not None:
+        statement, tables = cache_key
+        key = (statement, layout, response_format())
+        # Read the versions before querying: a write committed meanwhile leaves this entry already stale
+        version = table_versions(tables)
+        entry = sql_query_cache.get(key, version)
+        if entry is not None:
+            return entry.to_response('HIT')
 
     try:
         connection = get_db_connection()
-        cursor = connection.cursor(dictionary=True)
-        cursor.execute(query)
-        result = cursor.fetchall()
-        cursor.close()
-        connection.close()
+        plan = explain_select(connection, query)
+        verdict = admission(plan)
+        if verdict == 'reject':
+            return jsonify({"error": "Query is too expensive to run ad hoc.", "plan": plan}), 400
+        if verdict == 'queue':
+            with heavy_query_slot(SQL_QUERY_QUEUE_TIMEOUT) as held:
+                if not held:
+                    return jsonify({"error": "Too many expensive queries running; try again later.", "plan": plan}), 503, {"Retry-After": "5"}
+                result, columns, truncated = execute_select(connection, query, layout)
+        else:
+            result, columns, truncated = execute_select(connection, query, layout)
 
-        return jsonify(result)
+        payload = layout_payload(result, columns)
+        if columns is not None:
+            payload["truncated"] = truncated
+        response = render(payload)
+        if truncated:
+            response.headers['X-Truncated'] = 'true'
+        if cache_key is None:
+            response.headers['X-Cache'] = 'BYPASS'
+            return response
+        return sql_query_cache.put(key, None, version, response).to_response('MISS')
 
+    except (PoolExhaustedError, InvalidRequestError, QueryCancelledError):
+        raise
+    except mysql.connector.Error as e:
+        if e.errno == errorcode.ER_QUERY_TIMEOUT:
+            return jsonify({"error": "Query exceeded the %d ms execution time limit." % SQL_QUERY_TIMEOUT_MS}), 504
+        return jsonify({"error": str(e)}), 400
     except Exception as e:
         return jsonify({"error": str(e)}), 400
 
 
+# Asynchronous /sqlQuery jobs: statements run on a small per-worker thread pool and spool their rows to
+# SQL_JOB_DIR as a MessagePack sequence; job state lives next to them as JSON, so any worker can answer
+# status, result and cancellation requests for any job
+SQL_JOB_DIR = os.getenv('SQL_JOB_DIR', os.path.join(tempfile.gettempdir(), 'inspectify-sql-jobs'))
+SQL_JOB_WORKERS = int(os.getenv('SQL_JOB_WORKERS', 2))  # Statements running at once, per worker process
+SQL_JOB_QUEUE_SIZE = int(os.getenv('SQL_JOB_QUEUE_SIZE', 20))  # Further statements waiting, per worker process
+SQL_JOB_TIMEOUT_MS = int(os.getenv('SQL_JOB_TIMEOUT_MS', 600000))
+SQL_JOB_MAX_ROWS = int(os.getenv('SQL_JOB_MAX_ROWS', 1000000))
+SQL_JOB_MAX_BYTES = int(os.getenv('SQL_JOB_MAX_BYTES', 256 * 1024 * 1024))
+SQL_JOB_MAX_COST = float(os.getenv('SQL_JOB_MAX_COST', SQL_QUERY_MAX_COST * 50))
+SQL_JOB_TTL = float(os.getenv('SQL_JOB_TTL', 3600))  # Seconds a job's files are kept after its last update
+SQL_JOB_PROGRESS_EVERY = 20  # Batches between progress writes (which also keep a running job from expiring)
+SQL_JOB_ID = re.compile(r'^[0-9a-f]{32}$')
+
+def job_path(job_id, suffix):
+    return os.path.join(SQL_JOB_DIR, job_id + suffix)
+
+def read_job(job_id):
+    """Return a job's state, or None if it is unknown or expired"""
+    if not SQL_JOB_ID.match(job_id):
+        return None
+    try:
+        with open(job_path(job_id, '.json')) as f:
+            # Checked here, not only by expire_jobs (which runs on submit), so expired jobs are gone without new ones
+            if os.fstat(f.fileno()).st_mtime < time.time() - SQL_JOB_TTL:
+                remove_job_files(job_id)
+                return None
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+def remove_job_files(job_id):
+    for suffix in ('.json', '.msgpack', '.cancel'):
+        try:
+            os.remove(job_path(job_id, suffix))
+        except OSError:
+            pass
+
+def write_job(job):
+    path = job_path(job['id'], '.json')
+    with open(path + '.tmp', 'w') as f:
+        json.dump(job, f)
+    os.replace(path + '.tmp', path)
+
+def job_cancelled(job_id):
+    return os.path.exists(job_path(job_id, '.cancel'))
+
+def expire_jobs():
+    """Delete the files of jobs not updated within SQL_JOB_TTL (finished, abandoned, or orphaned by a dead worker)"""
+    cutoff = time.time() - SQL_JOB_TTL
+    try:
+        names = os.listdir(SQL_JOB_DIR)
+    except OSError:
+        return
+    for name in names:
+        path = os.path.join(SQL_JOB_DIR, name)
+        try:
+            if os.path.getmtime(path) < cutoff:
+                os.remove(path)
+        except OSError:
+            pass
+
+class JobExecutor:
+    """Bounded thread pool for this worker process's jobs: submit returns False once it is full"""
+
+    def __init__(self, workers, queue_size):
+        self.pid = os.getpid()
+        self.capacity = workers + queue_size
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='sql-job')
+        self._lock = threading.Lock()
+        self._outstanding = 0
+
+    def submit(self, fn, *args):
+        with self._lock:
+            if self._outstanding >= self.capacity:
+                return False
+            self._outstanding += 1
+        self._executor.submit(self._run, fn, args)
+        return True
+
+    def _run(self, fn, args):
+        try:
+            fn(*args)
+        finally:
+            with self._lock:
+                self._outstanding -= 1
+
+_job_executor = None
+_job_executor_lock = threading.Lock()
+
+def get_job_executor():
+    """Return this process's JobExecutor, creating it lazily (and again after a fork)"""
+    global _job_executor
+    with _job_executor_lock:
+        if _job_executor is None or _job_executor.pid != os.getpid():
+            _job_executor = JobExecutor(SQL_JOB_WORKERS, SQL_JOB_QUEUE_SIZE)
+        return _job_executor
+
+def run_sql_job(job_id, query):
+    """Run one job's statement, spooling its rows to disk, unless it was cancelled while queued"""
+    job = read_job(job_id)
+    if job is None or job_cancelled(job_id):
+        return
+    job.update(status='running', started_at=time.time())
+    write_job(job)
+    stats = RequestStats()
+    stats.route = '/sqlQuery/jobs'
+    stats.check = lambda: 'cancelled' if job_cancelled(job_id) else None
+    pool = get_pool()
+    connection = None
+    cursor = None
+    try:
+        connection = pool.acquire()
+        cursor = InstrumentedConnection(connection, stats).cursor(buffered=False)
+        cursor.execute(query)
+        job['columns'] = list(cursor.column_names)
+        size = 0
+        batches = 0
+        with open(job_path(job_id, '.msgpack'), 'wb') as spool:
+            while True:
+                rows = cursor.fetchmany(STREAM_BATCH_SIZE)
+                if not rows:
+                    break
+                room = SQL_JOB_MAX_ROWS - job['rows'] if size < SQL_JOB_MAX_BYTES else 0
+                if len(rows) > room:
+                    # Only a row read beyond the row or byte budget means the result was cut short
+                    job['truncated'] = True
+                    rows = rows[:room]
+                chunk = b''.join(pack(row) for row in rows)
+                spool.write(chunk)
+                size += len(chunk)
+                job['rows'] += len(rows)
+                if job['truncated']:
+                    break
+                if job_cancelled(job_id):
+                    job.update(status='cancelled', finished_at=time.time())
+                    write_job(job)
+                    return
+                batches += 1
+                if batches % SQL_JOB_PROGRESS_EVERY == 0:
+                    write_job(job)
+        job.update(status='done', finished_at=time.time())
+    except QueryCancelledError:
+        # DELETE arrived while MySQL was still executing; the watchdog killed the statement
+        job.update(status='cancelled', finished_at=time.time())
+    except mysql.connector.Error as e:
+        if e.errno == errorcode.ER_QUERY_TIMEOUT:
+            error = "Query exceeded the %d ms execution time limit." % SQL_JOB_TIMEOUT_MS
+        else:
+            error = str(e)
+        job.update(status='failed', error=error, finished_at=time.time())
+    except Exception as e:
+        print("Error running SQL job %s:" % job_id, e)
+        job.update(status='failed', error=str(e), finished_at=time.time())
+    finally:
+        if cursor is not None:
+            # On every path, before the connection can reach another request: closing untracks the
+            # statement from the watchdog (whose KILL would otherwise hit that request) and logs it
+            try:
+                cursor.close()
+            except Exception:
+                pass  # Cancelled or truncated: the unread rows go with the connection, which release discards
+        if connection is not None:
+            pool.release(connection)
+    if job_cancelled(job_id):
+        job['status'] = 'cancelled'
+    write_job(job)
+
+@app.route('/sqlQuery/jobs', methods=['POST'])
+def submit_sql_job():
+    """Queue a SELECT to run in the background; returns its job id at once (202)"""
+    if request.headers.get('X-API-KEY') != API_KEY:
+        return jsonify({"error": "Unauthorized"}), 401
+    data = request.json
+    query = guard_select(data.get("query", "").strip(), SQL_JOB_MAX_ROWS, SQL_JOB_TIMEOUT_MS)
+    try:
+        plan = explain_select(get_db_connection(), query)
+    except mysql.connector.Error as e:
+        return jsonify({"error": str(e)}), 400
+    if plan["cost"] > SQL_JOB_MAX_COST:
+        return jsonify({"error": "Query is too expensive to run even as a job.", "plan": plan}), 400
+
+    expire_jobs()
+    os.makedirs(SQL_JOB_DIR, exist_ok=True)
+    job = {
+        "id": uuid.uuid4().hex, "status": 'queued', "query": query, "plan": plan, "submitted_at": time.time(),
+        "started_at": None, "finished_at": None, "columns": None, "rows": 0, "truncated": False, "error": None
+    }
+    write_job(job)
+    if not get_job_executor().submit(run_sql_job, job['id'], query):
+        os.remove(job_path(job['id'], '.json'))
+        return jsonify({"error": "Too many queued jobs; try again later."}), 503, {"Retry-After": "30"}
+    response = jsonify(job)
+    response.status_code = 202
+    response.headers['Location'] = '/sqlQuery/jobs/%s' % job['id']
+    return response
+
+@app.route('/sqlQuery/jobs/<job_id>', methods=['GET'])
+def get_sql_job(job_id):
+    if request.headers.get('X-API-KEY') != API_KEY:
+        return jsonify({"error": "Unauthorized"}), 401
+    job = read_job(job_id)
+    if job is None:
+        return jsonify({"error": "Job not found or expired"}), 404
+    return jsonify(job)
+
+@app.route('/sqlQuery/jobs/<job_id>/results', methods=['GET'])
+def get_sql_job_results(job_id):
+    """One page of a finished job's rows, paged with ?limit= and the opaque ?cursor= like the list routes"""
+    if request.headers.get('X-API-KEY') != API_KEY:
+        return jsonify({"error": "Unauthorized"}), 401
+    job = read_job(job_id)
+    if job is None:
+        return jsonify({"error": "Job not found or expired"}), 404
+    if job['status'] != 'done':
+        return jsonify({"error": "Job is %s" % job['status'], "status": job['status']}), 409
+    layout = get_layout()
+    limit, offset = get_page_args('job:' + job_id, int)
+    offset = offset or 0
+    rows = []
+    with open(job_path(job_id, '.msgpack'), 'rb') as spool:
+        size = os.fstat(spool.fileno()).st_size
+        if not 0 <= offset <= size:
+            raise InvalidRequestError("Invalid cursor.")
+        spool.seek(offset)
+        unpacker = msgpack.Unpacker(spool, timestamp=3)
+        try:
+            for row in unpacker:
+                # A forged offset inside a record decodes as garbage, or as something other than a row
+                if not isinstance(row, list) or len(row) != len(job['columns']):
+                    raise ValueError(offset)
+                rows.append(row if layout == 'columns' else dict(zip(job['columns'], row)))
+                if len(rows) == limit:
+                    break
+        except (ValueError, msgpack.UnpackException):
+            raise InvalidRequestError("Invalid cursor.")
+        if offset < size and not rows:
+            raise InvalidRequestError("Invalid cursor.")
+        position = offset + unpacker.tell()
+        has_more = position < size
+    response = render(layout_payload(rows, job['columns'] if layout == 'columns' else None))
+    if has_more:
+        link_next_page(response, encode_cursor('job:' + job_id, position))
+    if job['truncated']:
+        response.headers['X-Truncated'] = 'true'
+    return response
+
+@app.route('/sqlQuery/jobs/<job_id>', methods=['DELETE'])
+def cancel_sql_job(job_id):
+    """Cancel a queued or running job, or discard a finished job's results"""
+    if request.headers.get('X-API-KEY') != API_KEY:
+        return jsonify({"error": "Unauthorized"}), 401
+    job = read_job(job_id)
+    if job is None:
+        return jsonify({"error": "Job not found or expired"}), 404
+    if job['status'] in ('queued', 'running'):
+        open(job_path(job_id, '.cancel'), 'w').close()
+        if job['status'] == 'queued':
+            job.update(status='cancelled', finished_at=time.time())
+            write_job(job)
+        return jsonify({"id": job_id, "status": 'cancelling' if job['status'] == 'running' else 'cancelled'}), 202
+    remove_job_files(job_id)
+    return jsonify({"id": job_id, "status": 'deleted'})
+
 if __name__ == '__main__':
     app.run(host='0.0.0.0', port=int(os.getenv('PORT', 5000)))
\ No newline at end of file
@@ -0,0 +1,111 @@
+"""guard_select: the only gate between /sqlQuery (and /sqlQuery/jobs) and MySQL
+
+    python -m pytest tests
+"""
+import os
+import sys
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from main import InvalidRequestError, guard_select, sql_tokens
+
+HINT = '/*+ MAX_EXECUTION_TIME(5000) */'
+
+def guard(sql):
+    return guard_select(sql, 100, 5000)
+
+class GuardSelectAcceptTest(unittest.TestCase):
+
+    def test_limit_and_hint_added(self):
+        self.assertEqual(guard("SELECT * FROM Home"), "SELECT %s * FROM Home LIMIT 101" % HINT)
+
+    def test_small_limit_kept(self):
+        self.assertEqual(guard("SELECT * FROM Home LIMIT 10"), "SELECT %s * FROM Home LIMIT 10" % HINT)
+
+    def test_large_limit_clamped(self):
+        self.assertEqual(guard("SELECT * FROM Home LIMIT 5000"), "SELECT %s * FROM Home LIMIT 101" % HINT)
+
+    def test_limit_with_offset(self):
+        self.assertEqual(guard("SELECT * FROM Home LIMIT 20, 5000"), "SELECT %s * FROM Home LIMIT 20, 101" % HINT)
+        self.assertEqual(
+            guard("SELECT * FROM Home LIMIT 5000 OFFSET 20"), "SELECT %s * FROM Home LIMIT 101 OFFSET 20" % HINT
+        )
+
+    def test_subquery_limit_left_alone(self):
+        self.assertEqual(
+            guard("SELECT * FROM (SELECT * FROM Home LIMIT 5000) t"),
+            "SELECT %s * FROM (SELECT * FROM Home LIMIT 5000) t LIMIT 101" % HINT
+        )
+
+    def test_trailing_semicolon_dropped(self):
+        self.assertEqual(guard("SELECT 1;"), "SELECT %s 1 LIMIT 101" % HINT)
+
+    def test_trailing_comment_cannot_swallow_limit(self):
+        self.assertEqual(guard("SELECT 1 -- note"), "SELECT %s 1 LIMIT 101 -- note" % HINT)
+
+    def test_client_hint_merged(self):
+        self.assertEqual(
+            guard("SELECT /*+ NO_INDEX(Home) */ * FROM Home"),
+            "SELECT /*+ MAX_EXECUTION_TIME(5000) NO_INDEX(Home) */ * FROM Home LIMIT 101"
+        )
+
+    def test_keywords_inside_strings_and_identifiers(self):
+        for sql in (
+            "SELECT * FROM Home WHERE home_name = 'x; DELETE FROM Home'",
+            "SELECT * FROM Home WHERE home_name = 'for update'",
+            "SELECT `into` FROM Home",
+            "SELECT * FROM Home WHERE home_name = 'it''s'",
+        ):
+            self.assertTrue(guard(sql).startswith("SELECT " + HINT), sql)
+
+class GuardSelectRejectTest(unittest.TestCase):
+
+    def assertRejected(self, sql):
+        with self.assertRaises(InvalidRequestError, msg=sql):
+            guard(sql)
+
+    def test_not_a_select(self):
+        for sql in ("", "DELETE FROM Home", "UPDATE Home SET num_floor = 1", "SHOW TABLES", "(SELECT 1)"):
+            self.assertRejected(sql)
+
+    def test_multiple_statements(self):
+        self.assertRejected("SELECT 1; SELECT 2")
+        self.assertRejected("SELECT 1; DROP TABLE Home")
+
+    def test_into(self):
+        self.assertRejected("SELECT * FROM Home INTO OUTFILE '/tmp/home'")
+        self.assertRejected("SELECT home_id INTO @x FROM Home")
+        self.assertRejected("SELECT * FROM Home WHERE home_id IN (SELECT home_id INTO @x FROM Home)")
+
+    def test_locking_reads(self):
+        self.assertRejected("SELECT * FROM Home FOR UPDATE")
+        self.assertRejected("SELECT * FROM Home FOR SHARE")
+        self.assertRejected("SELECT * FROM Home LOCK IN SHARE MODE")
+        self.assertRejected("select * from Home for update nowait")
+
+    def test_locking_reads_in_subqueries(self):
+        self.assertRejected("SELECT * FROM Home WHERE home_id IN (SELECT home_id FROM Home FOR UPDATE)")
+        self.assertRejected("SELECT * FROM (SELECT * FROM Homeowner LOCK IN SHARE MODE) t")
+        self.assertRejected("SELECT (SELECT MAX(home_id) FROM Home FOR SHARE) AS m")
+
+    def test_executable_comments(self):
+        self.assertRejected("SELECT /*! 1; DROP TABLE Home */ 1")
+
+    def test_unterminated(self):
+        self.assertRejected("SELECT 'abc")
+        self.assertRejected("SELECT `abc")
+        self.assertRejected("SELECT 1 /* never closed")
+
+    def test_limit_must_be_literal_and_last(self):
+        self.assertRejected("SELECT * FROM Home LIMIT %s")
+        self.assertRejected("SELECT * FROM Home LIMIT 10 PROCEDURE ANALYSE()")
+
+class SqlTokensTest(unittest.TestCase):
+
+    def test_depth(self):
+        depths = [(text, depth) for kind, text, start, end, depth in sql_tokens("a (b (c)) d") if kind != 'space']
+        self.assertEqual(depths, [('a', 0), ('(', 0), ('b', 1), ('(', 1), ('c', 2), (')', 1), (')', 0), ('d', 0)])
+
+if __name__ == '__main__':
+    unittest.main()